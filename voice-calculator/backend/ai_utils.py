@@ -1,6 +1,18 @@
 import re
+import hashlib
 import traceback
-from sympy import sympify, SympifyError, simplify, pretty
+
+from calc_utils import fast_evaluate, format_result, UnsupportedExpression
+from cache_utils import expression_cache, normalize_expression, KIND_SIMPLIFIED, KIND_STEPS, KIND_RESULT_ID
+from guard_utils import check_expression, run_guarded, time_budget, BudgetExceeded, ExpressionRejected
+from metrics_utils import time_stage, STAGE_CLEAN, STAGE_PARSE, STAGE_EVALUATE
+
+SIMPLIFY_BUDGET = 0.5  # Seconds full simplify() may run before the cheaper rewrite is kept
+
+# Names reported for the tier that produced a voice result
+TIER_NUMERIC = "numeric"
+TIER_REWRITE = "rewrite"
+TIER_SIMPLIFY = "simplify"
 
 # Mapping of spoken words to symbols
 VOICE_REPLACEMENTS = {
@@ -21,34 +33,275 @@ VOICE_REPLACEMENTS = {
     "percent": "/100",
 }
 
-def clean_voice_input(text):
+# Spoken number words
+SMALL_NUMBERS = {
+    "zero": 0, "one": 1, "two": 2, "three": 3, "four": 4,
+    "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+    "ten": 10, "eleven": 11, "twelve": 12, "thirteen": 13, "fourteen": 14,
+    "fifteen": 15, "sixteen": 16, "seventeen": 17, "eighteen": 18, "nineteen": 19,
+    "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50,
+    "sixty": 60, "seventy": 70, "eighty": 80, "ninety": 90,
+}
+SCALE_NUMBERS = {
+    "thousand": 1000,
+    "million": 1000000,
+    "billion": 1000000000,
+}
+
+_PARENTHESES = str.maketrans({"(": " ( ", ")": " ) "})  # Keep "(x" from hiding the word x
+_WORD_HYPHEN = re.compile(r"\b([a-z]+)-(?=([a-z]+)\b)")
+_LETTER = re.compile(r"[a-z]")
+_OPERAND = re.compile(r"[0-9.]+|[a-z]\w*(?:\(.*\))?")  # What a spoken function applies to
+_UNSUPPORTED = re.compile(r"[^0-9a-zA-Z+\-*/().%^ ]")
+
+def build_phrase_table(replacements):
+    """
+    Index a phrase-to-symbol mapping for clean_voice_input().
+
+    Phrases become space-padded search strings, so plain str.replace() only
+    matches whole words, ordered longest phrase first ("to the power of"
+    before "power").
+
+    Args:
+        replacements (dict): Mapping of spoken phrases to symbols.
+
+    Returns:
+        tuple: (list of (padded phrase, padded symbol), set of symbols that
+            are function names, e.g. "sqrt")
+    """
+    phrases = sorted(replacements.items(), key=lambda item: len(item[0].split()), reverse=True)
+    table = [(" %s " % " ".join(phrase.split()), f" {symbol} ") for phrase, symbol in phrases]
+    functions = {symbol for symbol in replacements.values() if symbol.isidentifier()}
+    return table, functions
+
+_PHRASE_TABLE = build_phrase_table(VOICE_REPLACEMENTS)
+
+# Words that may be written hyphenated ("twenty-three"); any other hyphen is a minus sign
+_HYPHENATED_WORDS = ({phrase.split()[0] for phrase in VOICE_REPLACEMENTS} | set(SMALL_NUMBERS)
+                     | set(SCALE_NUMBERS) | {"hundred", "point"})
+
+def _split_hyphenated(match):
+    """Turn the hyphen of "twenty-three" into a space, but keep "x-y" a subtraction."""
+    first, second = match.groups()
+    joined = first in _HYPHENATED_WORDS and second in _HYPHENATED_WORDS
+    return first + (" " if joined else "-")
+
+def _can_extend(current, value):
+    """Check whether a small number word continues the number read so far."""
+    if current % 100 == 0:
+        return True  # "one hundred five", "two thousand three"
+    return current % 100 >= 20 and current % 10 == 0 and value < 10  # "twenty three"
+
+def _read_number(words, start):
+    """
+    Read a run of spoken number words starting at words[start].
+
+    Returns:
+        tuple: (list of digit strings, index after the run)
+    """
+    numbers = []
+    total = current = 0
+    seen = False
+    i = start
+    while i < len(words):
+        word = words[i]
+        if word in SMALL_NUMBERS:
+            value = SMALL_NUMBERS[word]
+            if seen and not _can_extend(current, value):
+                numbers.append(str(total + current))
+                total = current = 0
+            current += value
+            seen = True
+        elif seen and word == "hundred":
+            current = (current or 1) * 100
+        elif seen and word in SCALE_NUMBERS:
+            total += (current or 1) * SCALE_NUMBERS[word]
+            current = 0
+        elif seen and word == "and" and i + 1 < len(words) and words[i + 1] in SMALL_NUMBERS:
+            pass  # "one hundred and five"
+        elif seen and word == "point" and i + 1 < len(words) and SMALL_NUMBERS.get(words[i + 1], 10) < 10:
+            digits = []
+            while i + 1 < len(words) and SMALL_NUMBERS.get(words[i + 1], 10) < 10:
+                i += 1
+                digits.append(str(SMALL_NUMBERS[words[i]]))
+            numbers.append(f"{total + current}.{''.join(digits)}")
+            return numbers, i + 1
+        else:
+            break
+        i += 1
+    if seen:
+        numbers.append(str(total + current))
+    return numbers, i
+
+def _convert_words(words, functions):
+    """Turn spoken numbers into digits and give each function symbol its operand in parentheses."""
+    tokens = []
+    i = 0
+    while i < len(words):
+        if words[i] in SMALL_NUMBERS:
+            numbers, i = _read_number(words, i)
+            tokens.extend(numbers)
+        else:
+            tokens.append(words[i])
+            i += 1
+    if functions.isdisjoint(tokens):
+        return tokens
+    for i in range(len(tokens) - 2, -1, -1):  # Right to left: "sqrt sqrt 16" -> "sqrt(sqrt(16))"
+        operand = tokens[i + 1]
+        if tokens[i] in functions and operand not in functions and _OPERAND.fullmatch(operand):
+            tokens[i:i + 2] = [f"{tokens[i]}({operand})"]
+    return tokens
+
+def clean_voice_input(text, phrase_table=None):
     """
     Clean up voice input by replacing common phrases with symbols.
 
+    Replaces whole-word phrases, longest first, with one str.replace() each.
+    The word-by-word pass that turns spoken numbers into digits ("twenty
+    three point five") and gives a function its operand ("square root of
+    sixteen" -> "sqrt(16)") only runs when a number word or function is left.
+
     Args:
         text (str): Raw transcribed voice input.
+        phrase_table (tuple, optional): Result of build_phrase_table();
+            defaults to the one built from VOICE_REPLACEMENTS.
 
     Returns:
         str: Cleaned expression ready for evaluation.
     """
-    text = text.lower()
-    for word, symbol in VOICE_REPLACEMENTS.items():
-        text = text.replace(word, symbol)
-    text = re.sub(r"[^0-9a-zA-Z+\-*/().%^ ]", "", text)  # Remove unsupported characters
-    return text.strip()
+    table, functions = _PHRASE_TABLE if phrase_table is None else phrase_table
+    text = _UNSUPPORTED.sub(" ", text.lower()).strip(" ")  # Remove unsupported characters
+    if "(" in text or ")" in text:
+        text = text.translate(_PARENTHESES)
+    if "-" in text:
+        text = _WORD_HYPHEN.sub(_split_hyphenated, text)
+    if "  " in text:
+        text = " ".join(text.split())
+    text = f" {text.rstrip('.')} "  # Drop a closing period
+    for phrase, symbol in table:
+        while phrase in text:  # Back-to-back repeats ("plus plus") share a space, so need a second pass
+            text = text.replace(phrase, symbol)
+    text = text.strip()
+    if _LETTER.search(text) is None:
+        return text
+    words = text.split()
+    if not functions.isdisjoint(words) or not SMALL_NUMBERS.keys().isdisjoint(words):
+        words = _convert_words(words, functions)
+    return " ".join(words)
 
-def process_voice_command(transcript):
+def simplify_expression(expression, budget=SIMPLIFY_BUDGET):
+    """
+    Reduce an expression with the cheapest SymPy tier that settles it.
+
+    Expressions without symbols are evaluated to a number. Otherwise the
+    smallest of the expression, expand() and cancel() is kept, and full
+    simplify() is only tried for non-polynomials, within the time budget.
+
+    Args:
+        expression (str): Cleaned expression.
+        budget (float): Seconds allowed for simplify().
+
+    Returns:
+        tuple: (result string, tier that produced it)
+
+    Raises:
+        SympifyError: If the text parses to something other than a math
+            expression, e.g. a boolean from words like "is" or "and"
+    """
+    from sympy import sympify, simplify, expand, cancel, count_ops, Expr, SympifyError
+
+    expr = sympify(expression)
+    if not isinstance(expr, Expr):
+        raise SympifyError(expression, "not a math expression")
+
+    if not expr.free_symbols:
+        try:
+            return str(format_result(float(expr))), TIER_NUMERIC
+        except TypeError:
+            pass  # Complex or otherwise not a real number
+
+    best = min((expr, expand(expr), cancel(expr)), key=count_ops)
+    if best.is_polynomial():
+        return str(best), TIER_REWRITE
+
+    try:
+        with time_budget(budget):
+            simplified = simplify(best)
+    except BudgetExceeded:
+        return str(best), TIER_REWRITE
+    if count_ops(simplified) < count_ops(best):
+        return str(simplified), TIER_SIMPLIFY
+    return str(best), TIER_REWRITE
+
+def render_steps(expression, result):
+    """
+    Render an expression and its result in a pretty, step-like form.
+
+    Args:
+        expression (str): Cleaned expression.
+        result (str): Result string from simplify_expression().
+
+    Returns:
+        str: Pretty-printed "expression = result"
+    """
+    from sympy import sympify, pretty
+
+    return pretty(sympify(expression)) + " = " + pretty(sympify(result))
+
+def _simplified(key):
+    """Get the (result, tier) for a normalized expression, computing it on a miss."""
+    cached = expression_cache.get((KIND_SIMPLIFIED, key))
+    if cached is None:
+        with time_stage(STAGE_PARSE):
+            check_expression(key)
+        with time_stage(STAGE_EVALUATE):
+            try:
+                # Plain arithmetic never needs SymPy
+                cached = str(format_result(fast_evaluate(key))), TIER_NUMERIC
+            except UnsupportedExpression:
+                cached = run_guarded("simplify", key)
+        expression_cache.set((KIND_SIMPLIFIED, key), cached)
+    return cached
+
+def get_steps(result_id):
+    """
+    Get the rendered steps for an earlier voice result.
+
+    Args:
+        result_id (str): The result_id returned by process_voice_command().
+
+    Returns:
+        str: Pretty-printed steps, or None if the result id is unknown or expired.
+    """
+    key = expression_cache.get((KIND_RESULT_ID, result_id))
+    if key is None:
+        return None
+
+    steps = expression_cache.get((KIND_STEPS, key))
+    if steps is None:
+        result, _ = _simplified(key)
+        steps = run_guarded("steps", key, result)
+        expression_cache.set((KIND_STEPS, key), steps)
+    return steps
+
+def process_voice_command(transcript, include_steps=False):
     """
     Process voice input and return the evaluated result.
 
     Args:
         transcript (str): Transcribed voice input string.
+        include_steps (bool): Render the steps now; otherwise fetch them
+            later with get_steps(result_id).
 
     Returns:
-        dict: A dictionary containing success status, result, error message, and steps (if any).
+        dict: A dictionary containing success status, result, error message,
+            steps (if requested), the tier used and a result id.
     """
+    from sympy import SympifyError  # Deferred with the rest of SymPy
+
     try:
-        cleaned_input = clean_voice_input(transcript)
+        with time_stage(STAGE_CLEAN):
+            cleaned_input = clean_voice_input(transcript)
 
         if not cleaned_input:
             return {
@@ -58,21 +311,29 @@ def process_voice_command(transcript):
                 "steps": None,
             }
 
-        # Attempt symbolic parsing with SymPy
-        expr = sympify(cleaned_input)
-        simplified = simplify(expr)
-        result = str(simplified)
+        # Reuse earlier work for the same normalized expression
+        key = normalize_expression(cleaned_input)
+        result, tier = _simplified(key)
 
-        # For explanation, generate a pretty (step-like) form
-        steps = pretty(expr) + " = " + pretty(simplified)
+        result_id = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+        expression_cache.set((KIND_RESULT_ID, result_id), key)
 
         return {
             "success": True,
             "result": result,
             "error": None,
-            "steps": steps,
+            "steps": get_steps(result_id) if include_steps else None,
+            "tier": tier,
+            "result_id": result_id,
         }
 
+    except ExpressionRejected:
+        return {
+            "success": False,
+            "result": None,
+            "error": "Expression is too complex to evaluate.",
+            "steps": None,
+        }
     except SympifyError:
         return {
             "success": False,
@@ -3,73 +3,212 @@ Voice Calculator Backend
 Flask API to handle calculations, voice recognition, and database operations.
 """
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, request, jsonify, send_from_directory, send_file, g
+from werkzeug.http import parse_etags
 import os
-import re
-import json
+import time
 import traceback
-from sympy import sympify, SympifyError
+from datetime import datetime, timedelta
 
-# Import custom modules
-from db_utils import init_db, get_calculation_history as get_history, add_calculation as add_history_entry, clear_history
-from ai_utils import process_voice_command
-from tts_utils import generate_tts as text_to_speech
+# Import custom modules (SymPy, NumPy and gTTS load on first use)
+from db_utils import init_db, get_pool_stats, get_preference, set_preference, settings_cache, DEFAULT_USER_ID, get_history_page, get_history_etag, get_last_calculation as get_last_entry, get_history_since, get_history_stats, search_history, SEARCH_PAGE_SIZE, SEARCH_MAX_PAGE_SIZE, SEARCH_MAX_OFFSET, SEARCH_RANK_WINDOW, HISTORY_PAGE_SIZE, HISTORY_MAX_PAGE_SIZE, add_calculation as add_history_entry, add_calculations as add_history_entries, clear_history, start_write_behind, configure_history_shards, HISTORY_SHARDS
+from ai_utils import process_voice_command, get_steps, clean_voice_input
+from tts_utils import generate_tts as text_to_speech, get_tts_cache_stats, warm_fragments, stream_tts, get_tts_path, VOICE_DIR
+from calc_utils import evaluate_vectorized, format_result
+from guard_utils import guarded_evaluate, run_guarded, check_expression, configure_eval_pool, start_eval_pool, get_guard_stats, ExpressionRejected, POOL_WORKERS
+from cache_utils import expression_cache, normalize_expression, KIND_RESULT
+from asset_utils import get_assets, IMMUTABLE_CACHE, REVALIDATE_CACHE, IDENTITY
+from events_utils import history_hub, event_stream, replay_events, STREAM_HEADERS
+from metrics_utils import observe_request, time_stage, register_collector, render_metrics, set_log_sample_rate, CONTENT_TYPE, STAGE_CLEAN, STAGE_PARSE, STAGE_EVALUATE
 
 app = Flask(__name__, static_folder='../frontend')
 
-# Initialize database
-init_db()
+# Limits for /api/calculate/batch
+MAX_BATCH_SIZE = 100  # Maximum expressions per batch request
+BATCH_TIME_LIMIT = 2.0  # Seconds of evaluation per batch; later items are skipped
+
+# Run SymPy evaluation in worker processes with time and memory limits.
+# The database and the worker pool start on first use, or in warm_up().
+configure_eval_pool(int(os.environ.get('EVAL_POOL_WORKERS', POOL_WORKERS)))
+
+# Per-request log lines are DEBUG; optionally emit a sample of them at INFO
+set_log_sample_rate(float(os.environ.get('LOG_SAMPLE_RATE', 0)))
+
+# Spread history over shard files by user id, so users' writes don't share one lock
+configure_history_shards(int(os.environ.get('HISTORY_SHARDS', HISTORY_SHARDS)))
+
+@app.before_request
+def start_request_timer():
+    """Remember when the request started, for the latency histogram."""
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    """Record the request's latency under its route pattern."""
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        observe_request(route, request.method, response.status_code, time.perf_counter() - started)
+    return response
+
+def _asset_response(asset, cache_control):
+    """Send a precompressed asset in the best encoding the client accepts, or 304."""
+    encoding = asset.negotiate(request.headers.get('Accept-Encoding'))
+    response = app.response_class(asset.bodies[encoding], content_type=asset.content_type)
+    if encoding != IDENTITY:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    response.headers['Cache-Control'] = cache_control
+    response.set_etag(asset.etag(encoding))
+    return response.make_conditional(request)
 
 @app.route('/')
 def index():
-    """Serve the main application page."""
-    return send_from_directory(app.static_folder, 'index.html')
+    """Serve the main application page, pointing at fingerprinted asset URLs."""
+    assets = get_assets(reload=app.debug)
+    if assets.index is None:
+        return send_from_directory(app.static_folder, 'index.html')
+    return _asset_response(assets.index, REVALIDATE_CACHE)
+
+@app.route('/assets/<path:path>')
+def fingerprinted_files(path):
+    """Serve a fingerprinted asset; its URL changes with its content, so it is cached for good."""
+    asset = get_assets(reload=app.debug).by_url.get(f'/assets/{path}')
+    if asset is None:
+        return jsonify({'error': 'Asset not found'}), 404
+    return _asset_response(asset, IMMUTABLE_CACHE)
 
 @app.route('/<path:path>')
 def static_files(path):
-    """Serve static files."""
-    return send_from_directory(app.static_folder, path)
+    """Serve static files under their plain names (e.g. modules imported by relative path)."""
+    asset = get_assets(reload=app.debug).assets.get(path)
+    if asset is None:
+        return send_from_directory(app.static_folder, path)
+    return _asset_response(asset, REVALIDATE_CACHE)
+
+def _looks_like_code(clean_expr):
+    """Check whether a cleaned expression is trying to execute code."""
+    return any(keyword in clean_expr.lower() for keyword in ['import', 'exec', 'eval', 'os', 'sys', '__'])
+
+def _calculate_expression(expression):
+    """
+    Clean, validate and evaluate one expression, reusing cached results.
+
+    Returns:
+        tuple: (response payload, HTTP status)
+    """
+    # Basic validation
+    if not expression or not isinstance(expression, str):
+        return {'error': 'No expression provided'}, 400
+    
+    # Security: Only allow valid mathematical expressions
+    # Remove anything that's not a number, operator, decimal point, parentheses, or math functions
+    with time_stage(STAGE_CLEAN):
+        clean_expr = normalize_expression(expression)
+    
+    # Check if the expression is trying to execute code
+    if _looks_like_code(clean_expr):
+        return {'error': 'Invalid expression'}, 400
+    
+    # Evaluate with the fast numeric path, falling back to sympy when needed
+    try:
+        cached = expression_cache.get((KIND_RESULT, clean_expr))
+        if cached is None:
+            cached = guarded_evaluate(clean_expr)
+            expression_cache.set((KIND_RESULT, clean_expr), cached)
+        result, engine = cached
+        return {'result': format_result(result), 'engine': engine}, 200
+    except ExpressionRejected as e:
+        return {'error': 'Expression too complex', 'reason': e.reason}, 400
+    except (ValueError, TypeError, ZeroDivisionError) as e:  # SympifyError is a ValueError
+        app.logger.error(f"Calculation error: {str(e)}")
+        return {'error': 'Invalid expression'}, 400
 
 @app.route('/api/calculate', methods=['POST'])
 def calculate():
     """Calculate the result of a mathematical expression."""
+    try:
+        data = request.json
+        payload, status = _calculate_expression(data.get('expression', ''))
+        return jsonify(payload), status
+            
+    except Exception as e:
+        app.logger.error(f"Server error in calculate: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({'error': 'Server error'}), 500
+
+@app.route('/api/calculate/batch', methods=['POST'])
+def calculate_batch():
+    """Calculate many expressions in one request, optionally saving them to the user's history."""
+    try:
+        data = request.json
+        expressions = data.get('expressions')
+        
+        if not isinstance(expressions, list) or not expressions:
+            return jsonify({'error': 'No expressions provided'}), 400
+        if len(expressions) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'Too many expressions (max {MAX_BATCH_SIZE})'}), 400
+        
+        start_eval_pool(wait=True)  # Worker start-up doesn't count against the time limit
+        deadline = time.monotonic() + BATCH_TIME_LIMIT
+        results = []
+        for expression in expressions:
+            if time.monotonic() > deadline:
+                results.append({'expression': expression, 'error': 'Time limit exceeded'})
+                continue
+            try:
+                payload, _ = _calculate_expression(expression)
+            except Exception as e:  # e.g. a failed worker; fails this item, not the batch
+                app.logger.error(f"Batch calculation error: {str(e)}")
+                payload = {'error': 'Calculation failed'}
+            results.append({'expression': expression, **payload})
+        
+        # Save all successful items in a single transaction
+        if data.get('save_history'):
+            add_history_entries([(item['expression'], str(item['result'])) for item in results if 'result' in item],
+                                user_id=request.args.get('user_id') or DEFAULT_USER_ID)
+        
+        return jsonify({'results': results})
+    except Exception as e:
+        app.logger.error(f"Server error in calculate batch: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({'error': 'Server error'}), 500
+
+@app.route('/api/calculate/vector', methods=['POST'])
+def calculate_vector():
+    """Evaluate one expression over ranges, lists or a grid of variable values."""
     try:
         data = request.json
         expression = data.get('expression', '')
         
-        # Basic validation
-        if not expression:
+        if not expression or not isinstance(expression, str):
             return jsonify({'error': 'No expression provided'}), 400
         
-        # Security: Only allow valid mathematical expressions
-        # Remove anything that's not a number, operator, decimal point, parentheses, or math functions
-        clean_expr = re.sub(r'[^0-9+\-*/.()\s^a-zA-Z]', '', expression)
-        
-        # Check if the expression is trying to execute code
-        if any(keyword in clean_expr.lower() for keyword in ['import', 'exec', 'eval', 'os', 'sys', '__']):
+        clean_expr = normalize_expression(expression)
+        if _looks_like_code(clean_expr):
             return jsonify({'error': 'Invalid expression'}), 400
         
-        # Try to evaluate safely using sympy
         try:
-            result = float(sympify(clean_expr))
-            
-            # Round to reasonable precision for display
-            if result.is_integer():
-                result = int(result)
-            elif abs(result) > 1e10 or (abs(result) < 1e-10 and result != 0):
-                # Use scientific notation for very large/small numbers
-                result = f"{result:.10e}"
-            else:
-                # Limit decimal places
-                result = round(result, 10)
-                
-            return jsonify({'result': result})
-        except (SympifyError, ValueError, TypeError) as e:
-            app.logger.error(f"Calculation error: {str(e)}")
-            return jsonify({'error': 'Invalid expression'}), 400
+            with time_stage(STAGE_PARSE):
+                check_expression(clean_expr)
+            # Parsing and compiling run SymPy, so they get the worker's time and memory limits
+            with time_stage(STAGE_EVALUATE):
+                result = run_guarded(
+                    'vectorize',
+                    clean_expr,
+                    data.get('variables'),
+                    bool(data.get('grid', False)),
+                    data.get('encoding', 'list'),
+                )
+            return jsonify(result)
+        except ExpressionRejected as e:
+            return jsonify({'error': 'Expression too complex', 'reason': e.reason}), 400
+        except (ValueError, TypeError, KeyError) as e:  # SympifyError is a ValueError
+            app.logger.error(f"Vector calculation error: {str(e)}")
+            return jsonify({'error': f'Invalid expression or variables: {str(e)}'}), 400
             
     except Exception as e:
-        app.logger.error(f"Server error in calculate: {str(e)}")
+        app.logger.error(f"Server error in calculate vector: {str(e)}")
         app.logger.error(traceback.format_exc())
         return jsonify({'error': 'Server error'}), 500
 
@@ -83,8 +222,8 @@ def voice_process():
         if not transcript:
             return jsonify({'error': 'No transcript provided'}), 400
         
-        # Use AI to process voice command
-        result = process_voice_command(transcript)
+        # Use AI to process voice command; steps are rendered only on request
+        result = process_voice_command(transcript, include_steps=bool(data.get('steps', False)))
         
         return jsonify(result)
     except Exception as e:
@@ -92,6 +231,21 @@ def voice_process():
         app.logger.error(traceback.format_exc())
         return jsonify({'error': 'Voice processing failed'}), 500
 
+@app.route('/api/voice-process/<result_id>/steps', methods=['GET'])
+def voice_steps(result_id):
+    """Get the steps for an earlier voice result."""
+    try:
+        steps = get_steps(result_id)
+        if steps is None:
+            return jsonify({'error': 'Unknown or expired result id'}), 404
+        return jsonify({'result_id': result_id, 'steps': steps})
+    except ExpressionRejected as e:
+        return jsonify({'error': 'Expression too complex', 'reason': e.reason}), 400
+    except Exception as e:
+        app.logger.error(f"Voice steps error: {str(e)}")
+        app.logger.error(traceback.format_exc())
+        return jsonify({'error': 'Could not render steps'}), 500
+
 @app.route('/api/tts', methods=['POST'])
 def generate_tts():
     """Generate text-to-speech audio."""
@@ -110,14 +264,76 @@ def generate_tts():
         app.logger.error(f"TTS error: {str(e)}")
         return jsonify({'error': 'Text-to-speech generation failed'}), 500
 
+@app.route('/api/tts/stream', methods=['GET', 'POST'])
+def stream_tts_audio():
+    """Stream text-to-speech audio as it is generated, in a single round trip."""
+    try:
+        params = request.args if request.method == 'GET' else (request.json or {})
+        text = params.get('text', '')
+        lang = params.get('lang', 'en')
+        
+        if not text:
+            return jsonify({'error': 'No text provided'}), 400
+        
+        filename, chunks = stream_tts(text, lang)
+        
+        if chunks is None:
+            # Cached: let werkzeug handle Range/conditional requests and sendfile
+            response = send_file(get_tts_path(filename), mimetype='audio/mpeg', conditional=True)
+            response.headers['X-TTS-Cache'] = 'hit'
+            return response
+        
+        # No Content-Length, so the body is sent with chunked transfer encoding
+        response = Response(chunks, mimetype='audio/mpeg')
+        response.headers['X-TTS-Cache'] = 'miss'
+        response.headers['X-Audio-Url'] = f'/audio/{filename}'
+        return response
+    except Exception as e:
+        app.logger.error(f"TTS streaming error: {str(e)}")
+        return jsonify({'error': 'Text-to-speech generation failed'}), 500
+
+@app.route('/audio/<path:filename>')
+def audio_files(filename):
+    """Serve cached TTS audio with Range and conditional request support."""
+    return send_from_directory(VOICE_DIR, filename, mimetype='audio/mpeg', conditional=True)
+
+def _history_get(args, if_none_match):
+    """
+    Read one page of history for the Flask and ASGI routes. Unchanged history
+    is answered 304 from the in-memory version tag, without a query.
+
+    Args:
+        args (dict): Query parameters: limit, cursor and user_id, all optional
+        if_none_match (str): The request's If-None-Match header, if any
+
+    Returns:
+        tuple: (JSON payload or None, status code, ETag or None)
+    """
+    etag = get_history_etag()
+    if if_none_match and parse_etags(if_none_match).contains_weak(etag):
+        return None, 304, etag
+    try:
+        limit = min(max(int(args.get('limit', HISTORY_PAGE_SIZE)), 1), HISTORY_MAX_PAGE_SIZE)
+    except ValueError:
+        return {'error': 'Invalid limit'}, 400, None
+    try:
+        history, next_cursor = get_history_page(limit, args.get('cursor'), args.get('user_id'))
+    except ValueError:
+        return {'error': 'Invalid cursor'}, 400, None
+    return {'history': history, 'next_cursor': next_cursor}, 200, etag
+
 @app.route('/api/history', methods=['GET', 'POST', 'DELETE'])
 def handle_history():
-    """Get, add, or clear calculation history."""
+    """Get (one page, newest first), add, or clear (all users') calculation history."""
     try:
         if request.method == 'GET':
-            # Get history entries
-            history = get_history()
-            return jsonify({'history': history})
+            payload, status, etag = _history_get(request.args, request.headers.get('If-None-Match'))
+            response = jsonify(payload) if payload is not None else app.response_class()
+            response.status_code = status
+            if etag:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'  # Revalidate with If-None-Match
+            return response
             
         elif request.method == 'POST':
             # Add new history entry
@@ -126,8 +342,12 @@ def handle_history():
             
             if not entry:
                 return jsonify({'error': 'No entry provided'}), 400
-                
-            add_history_entry(entry)
+            
+            # The frontend sends "expression = result"
+            expression, separator, result = entry.rpartition(' = ')
+            if not separator:
+                expression, result = entry, ''
+            add_history_entry(expression, result, user_id=request.args.get('user_id') or DEFAULT_USER_ID)
             return jsonify({'success': True})
             
         elif request.method == 'DELETE':
@@ -139,20 +359,123 @@ def handle_history():
         app.logger.error(f"History operation error: {str(e)}")
         return jsonify({'error': 'History operation failed'}), 500
 
+def _parse_date_bound(value, end=False):
+    """Parse an ISO date or timestamp; a bare date as an end bound covers the whole day."""
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed.isoformat()
+
+def _history_search(args):
+    """
+    Run a history search for the Flask and ASGI routes.
+
+    Args:
+        args (dict): Query parameters: q, and optionally limit, offset,
+            user_id, since, until (ISO dates or timestamps) and order (rank or recent)
+
+    Returns:
+        tuple: (JSON payload, status code)
+    """
+    query = args.get('q', '')
+    if not query.strip():
+        return {'error': 'No search query provided'}, 400
+    order = args.get('order', 'rank')
+    if order not in ('rank', 'recent'):
+        return {'error': 'Invalid order'}, 400
+    try:
+        limit = min(max(int(args.get('limit', SEARCH_PAGE_SIZE)), 1), SEARCH_MAX_PAGE_SIZE)
+        offset = min(max(int(args.get('offset', 0)), 0), SEARCH_MAX_OFFSET)
+    except ValueError:
+        return {'error': 'Invalid limit or offset'}, 400
+    if order == 'rank' and offset >= SEARCH_RANK_WINDOW:
+        return {'error': f'Ranked results end at {SEARCH_RANK_WINDOW}; use order=recent to page further'}, 400
+    try:
+        since = _parse_date_bound(args['since']) if args.get('since') else None
+        until = _parse_date_bound(args['until'], end=True) if args.get('until') else None
+    except ValueError:
+        return {'error': 'Invalid date range'}, 400
+
+    try:
+        results, next_offset = search_history(query, limit, offset, args.get('user_id'), since, until, order)
+    except ValueError:
+        return {'error': 'Search query has no searchable terms'}, 400
+    return {'results': results, 'next_offset': next_offset}, 200
+
+@app.route('/api/history/search', methods=['GET'])
+def history_search():
+    """Full-text search over history with prefix matching, ranking and a date range."""
+    try:
+        payload, status = _history_search(request.args)
+        return jsonify(payload), status
+    except Exception as e:
+        app.logger.error(f"History search error: {str(e)}")
+        return jsonify({'error': 'History search failed'}), 500
+
+def _open_history_stream(args, last_event_id, notify=None):
+    """
+    Subscribe to history events and read the entries to replay, for the Flask
+    and ASGI stream routes. The subscription opens first, so nothing committed
+    while the backlog is read is missed.
+
+    Args:
+        args (dict): Query parameters: user_id and last_event_id, both optional
+        last_event_id (str): The request's Last-Event-ID header, if any
+        notify (callable): Wake-up callback for the subscriber
+
+    Returns:
+        tuple: (subscriber, backlog events, None) or
+            (None, None, (error payload, status code))
+    """
+    try:
+        last_id = last_event_id or args.get('last_event_id')
+        last_id = int(last_id) if last_id else None
+    except ValueError:
+        return None, None, ({'error': 'Invalid Last-Event-ID'}, 400)
+
+    user_id = args.get('user_id')
+    subscriber = history_hub.subscribe(user_id, notify)
+    if subscriber is None:
+        return None, None, ({'error': 'Too many open streams'}, 503)
+    try:
+        backlog = replay_events(get_history_since(last_id, user_id)) if last_id is not None else []
+    except Exception:
+        history_hub.unsubscribe(subscriber)
+        raise
+    return subscriber, backlog, None
+
+@app.route('/api/history/stream', methods=['GET'])
+def history_stream():
+    """Push history changes as Server-Sent Events instead of being polled."""
+    try:
+        subscriber, backlog, error = _open_history_stream(
+            request.args, request.headers.get('Last-Event-ID'))
+        if error:
+            payload, status = error
+            return jsonify(payload), status
+        return Response(event_stream(subscriber, backlog),
+                        mimetype='text/event-stream', headers=STREAM_HEADERS)
+    except Exception as e:
+        app.logger.error(f"History stream error: {str(e)}")
+        return jsonify({'error': 'History stream failed'}), 500
+
+@app.route('/api/history/stats', methods=['GET'])
+def history_stats():
+    """Get history row, user and size counts per shard."""
+    try:
+        return jsonify(get_history_stats())
+    except Exception as e:
+        app.logger.error(f"History stats error: {str(e)}")
+        return jsonify({'error': 'Failed to get history stats'}), 500
+
 @app.route('/api/preferences/theme', methods=['GET', 'POST'])
 def handle_theme_preference():
-    """Get or set theme preference."""
+    """Get or set theme preference (per user, served from the settings cache)."""
     try:
+        user_id = request.args.get('user_id') or DEFAULT_USER_ID
+        
         if request.method == 'GET':
-            # Try to read from file
-            theme_file = os.path.join(os.path.dirname(__file__), '..', 'user_preferences.json')
-            
-            if os.path.exists(theme_file):
-                with open(theme_file, 'r') as f:
-                    preferences = json.load(f)
-                    return jsonify({'theme': preferences.get('theme', 'light')})
-            
-            return jsonify({'theme': 'light'})  # Default
+            return jsonify({'theme': get_preference('theme', 'light', user_id=user_id)})
             
         elif request.method == 'POST':
             data = request.json
@@ -162,18 +485,8 @@ def handle_theme_preference():
             if theme not in ['light', 'dark']:
                 return jsonify({'error': 'Invalid theme'}), 400
                 
-            # Save to file
-            theme_file = os.path.join(os.path.dirname(__file__), '..', 'user_preferences.json')
-            
-            preferences = {}
-            if os.path.exists(theme_file):
-                with open(theme_file, 'r') as f:
-                    preferences = json.load(f)
-                    
-            preferences['theme'] = theme
-            
-            with open(theme_file, 'w') as f:
-                json.dump(preferences, f)
+            if not set_preference('theme', theme, user_id=user_id):
+                return jsonify({'error': 'Theme operation failed'}), 500
                 
             return jsonify({'success': True})
             
@@ -181,25 +494,124 @@ def handle_theme_preference():
         app.logger.error(f"Theme preference error: {str(e)}")
         return jsonify({'error': 'Theme operation failed'}), 500
 
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """Get expression, TTS, settings and static asset cache counters."""
+    return jsonify({
+        'expression': expression_cache.stats(),
+        'tts': get_tts_cache_stats(),
+        'settings': settings_cache.stats(),
+        'assets': get_assets().stats(),
+    })
+
+def _service_metrics():
+    """Cache, database pool, guard and stream values reported on each /metrics scrape."""
+    caches = {'expression': expression_cache.stats(), 'tts': get_tts_cache_stats()}
+    families = [
+        ('cache_hits_total', 'counter', 'Cache lookups served from the cache.',
+         [({'cache': name}, stats['hits']) for name, stats in caches.items()]),
+        ('cache_misses_total', 'counter', 'Cache lookups that had to compute the value.',
+         [({'cache': name}, stats['misses']) for name, stats in caches.items()]),
+        ('cache_hit_ratio', 'gauge', 'Share of cache lookups served from the cache.',
+         [({'cache': name}, stats['hit_ratio']) for name, stats in caches.items()]),
+        ('cache_evictions_total', 'counter', 'Entries evicted to stay within the cache limits.',
+         [({'cache': name}, stats['evictions']) for name, stats in caches.items()]),
+        ('cache_entries', 'gauge', 'Entries currently cached.',
+         [({'cache': 'expression'}, caches['expression']['size']), ({'cache': 'tts'}, caches['tts']['files'])]),
+    ]
+
+    pool = get_pool_stats()
+    if pool is not None:
+        families += [
+            ('db_pool_size', 'gauge', 'Maximum open database connections.', [({}, pool['size'])]),
+            ('db_pool_connections', 'gauge', 'Open database connections by state.',
+             [({'state': 'in_use'}, pool['in_use']), ({'state': 'idle'}, pool['idle'])]),
+            ('db_write_behind_pending', 'gauge', 'History inserts queued but not yet committed.',
+             [({}, pool['write_behind_pending'])]),
+        ]
+        if 'shards' in pool:
+            families.append(('db_shard_connections', 'gauge', 'Open history shard connections by state.',
+                             [({'shard': index, 'state': state}, shard[state])
+                              for index, shard in enumerate(pool['shards']) for state in ('in_use', 'idle')]))
+
+    guard = get_guard_stats()
+    families += [
+        ('eval_rejections_total', 'counter', 'Expressions refused or aborted by the evaluation guards.',
+         [({'reason': reason}, count) for reason, count in sorted(guard['rejections'].items())]),
+        ('eval_workers_recycled_total', 'counter', 'Evaluation workers killed and replaced.',
+         [({}, guard['recycled_workers'])]),
+    ]
+
+    streams = history_hub.stats()
+    families += [
+        ('history_stream_subscribers', 'gauge', 'Open history event streams.', [({}, streams['subscribers'])]),
+        ('history_stream_slow_disconnects_total', 'counter',
+         'History streams disconnected for falling too far behind.', [({}, streams['slow_disconnects'])]),
+    ]
+    return families
+
+register_collector(_service_metrics)
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose request latency, stage timings, cache and pool metrics in Prometheus text format."""
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
+
+@app.route('/api/guard/stats', methods=['GET'])
+def guard_stats():
+    """Get evaluation guard rejection counters and worker pool state."""
+    return jsonify(get_guard_stats())
+
 @app.route('/api/calculation/last', methods=['GET'])
 def get_last_calculation():
-    """Get the last calculation."""
+    """Get the last calculation (served from memory)."""
     try:
-        history = get_history()
-        if history:
-            # Extract just the result from the last history entry
-            last_entry = history[0]
-            result = last_entry.split('=')[1].strip() if '=' in last_entry else ''
-            return jsonify({'calculation': result})
-        
-        return jsonify({'calculation': ''})
+        last_entry = get_last_entry(request.args.get('user_id'))
+        return jsonify({'calculation': last_entry['result'] if last_entry else ''})
     except Exception as e:
         app.logger.error(f"Last calculation error: {str(e)}")
         return jsonify({'error': 'Failed to get last calculation'}), 500
 
+def warm_up():
+    """
+    Prime the database pool, static assets, expression parser, fast-path
+    evaluator and evaluation workers so the first requests don't pay for them.
+    """
+    started = time.perf_counter()
+    init_db()
+    get_assets()  # Hashes and compresses the frontend
+    get_last_entry()  # Loads the last-result slot and history version
+    _calculate_expression('1 + 2 * 3')
+    evaluate_vectorized('x + 1', {'x': [0]})  # Imports SymPy and NumPy
+    clean_voice_input('two plus two')
+    start_eval_pool(wait=True)
+    app.logger.info(f"Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+def startup():
+    """
+    Start the optional background work the environment asks for. Called by
+    the entry points (below, and asgi.py's lifespan), not on import: the
+    evaluation workers re-import the main module while they bootstrap.
+    """
+    # Optionally move history writes off the request path
+    if os.environ.get('HISTORY_WRITE_BEHIND', 'False').lower() == 'true':
+        start_write_behind()
+
+    # Optionally speak numeric results from pre-rendered audio fragments
+    if os.environ.get('TTS_FRAGMENTS', 'False').lower() == 'true':
+        try:
+            warm_fragments()
+        except RuntimeError as e:
+            app.logger.warning(f"TTS fragments unavailable: {str(e)}")
+
+    # Optionally warm up before taking traffic, instead of on the first requests
+    if os.environ.get('WARM_UP', 'False').lower() == 'true':
+        warm_up()
+
 if __name__ == '__main__':
     # Use environment variables for configuration
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('DEBUG', 'False').lower() == 'true'
     
+    startup()
     app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
@@ -0,0 +1,442 @@
+"""
+Voice Calculator ASGI entry point.
+Serves the same routes as app.py from an asyncio event loop. The routes that
+wait on TTS, SymPy or the database run natively: their blocking calls go to
+bounded executors, so a waiting request holds no thread. Every other route is
+passed through to the Flask app.
+
+Run with any ASGI server, for example:
+    uvicorn asgi:app --port 5000
+"""
+import io
+import os
+import sys
+import time
+import asyncio
+import logging
+import traceback
+from functools import partial
+from urllib.parse import parse_qs
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app as flask_app, _calculate_expression, _history_get, _history_search, _open_history_stream, process_voice_command, startup
+from db_utils import add_calculation, close_db, POOL_SIZE, DEFAULT_USER_ID
+from tts_utils import generate_tts, lookup_tts, stream_tts, tts_cache_key
+from guard_utils import stop_eval_pool
+from events_utils import history_hub, format_events, HEARTBEAT, HEARTBEAT_INTERVAL, RETRY_MS, STREAM_HEADERS
+from metrics_utils import observe_request
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+TTS_EXECUTOR_WORKERS = 32  # Blocking TTS backend calls in flight at once
+EVAL_EXECUTOR_WORKERS = 8  # Threads evaluating or waiting on evaluation workers
+WSGI_EXECUTOR_WORKERS = 16  # Threads running routes passed through to Flask
+
+_executors = {
+    "tts": ThreadPoolExecutor(TTS_EXECUTOR_WORKERS, thread_name_prefix="asgi-tts"),
+    "eval": ThreadPoolExecutor(EVAL_EXECUTOR_WORKERS, thread_name_prefix="asgi-eval"),
+    "db": ThreadPoolExecutor(POOL_SIZE, thread_name_prefix="asgi-db"),  # One per pooled connection
+    "wsgi": ThreadPoolExecutor(WSGI_EXECUTOR_WORKERS, thread_name_prefix="asgi-wsgi"),
+}
+
+# TTS cache key -> future for the synthesis in progress, shared by waiters
+_tts_inflight = {}
+
+
+async def _run(executor, func, *args, **kwargs):
+    """Run a blocking call in one of the executors and await its result."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executors[executor], partial(func, *args, **kwargs))
+
+
+class _ExecutorStream:
+    """
+    Async iterator over a blocking iterable (a WSGI body or TTS stream),
+    advanced one chunk at a time in an executor.
+    """
+
+    def __init__(self, iterable, executor, iterator=None, first=None):
+        self._iterable = iterable
+        self._iterator = iterator if iterator is not None else iter(iterable)
+        self._executor = executor
+        self._first = first
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._first is not None:
+            chunk, self._first = self._first, None
+            return chunk
+        chunk = await _run(self._executor, next, self._iterator, None)
+        if chunk is None:
+            raise StopAsyncIteration
+        return chunk
+
+    async def aclose(self):
+        """Close the iterable, e.g. releasing a TTS claim if the client went away."""
+        targets = [self._iterable] if self._iterator is self._iterable else [self._iterator, self._iterable]
+        for target in targets:
+            if hasattr(target, "close"):
+                await _run(self._executor, target.close)
+
+
+class _Request:
+    """The parts of an HTTP request the native routes need."""
+
+    def __init__(self, scope, body, receive=None):
+        self.receive = receive
+        self.method = scope["method"]
+        self.path = scope["path"]
+        self.args = {key: values[0] for key, values in
+                     parse_qs(scope.get("query_string", b"").decode("latin-1")).items()}
+        self.headers = {name.decode("latin-1").lower(): value.decode("latin-1")
+                        for name, value in scope.get("headers", [])}
+        self.body = body
+
+    def json(self):
+        """Parse the body as JSON, rejecting other content types like Flask's request.json."""
+        if not self.headers.get("content-type", "").startswith("application/json"):
+            raise ValueError("Request body is not JSON")
+        return flask_app.json.loads(self.body)
+
+
+def _json(payload, status=200):
+    """Build a JSON response serialized exactly as Flask's jsonify() does."""
+    return status, [("Content-Type", "application/json")], flask_app.json.response(payload).get_data()
+
+
+async def calculate(request):
+    """Calculate the result of a mathematical expression."""
+    try:
+        data = request.json()
+        payload, status = await _run("eval", _calculate_expression, data.get('expression', ''))
+        return _json(payload, status)
+    except Exception as e:
+        logger.error(f"Server error in calculate: {str(e)}")
+        logger.error(traceback.format_exc())
+        return _json({'error': 'Server error'}, 500)
+
+
+async def voice_process(request):
+    """Process voice commands; SymPy work runs off the event loop."""
+    try:
+        data = request.json()
+        transcript = data.get('transcript', '')
+        if not transcript:
+            return _json({'error': 'No transcript provided'}, 400)
+
+        result = await _run("eval", process_voice_command, transcript,
+                            include_steps=bool(data.get('steps', False)))
+        return _json(result)
+    except Exception as e:
+        logger.error(f"Voice processing error: {str(e)}")
+        logger.error(traceback.format_exc())
+        return _json({'error': 'Voice processing failed'}, 500)
+
+
+async def _synthesize(text, lang="en", slow=False):
+    """
+    Return the filename for text, synthesizing it at most once per process:
+    concurrent requests for the same phrase await one executor call.
+    """
+    filename = lookup_tts(text, lang, slow)
+    if filename is not None:
+        return filename
+
+    key = tts_cache_key(text, lang, slow)
+    future = _tts_inflight.get(key)
+    if future is None:
+        future = asyncio.ensure_future(_run("tts", generate_tts, text, lang, slow))
+        _tts_inflight[key] = future
+        future.add_done_callback(lambda _: _tts_inflight.pop(key, None))
+    return await asyncio.shield(future)
+
+
+async def tts(request):
+    """Generate text-to-speech audio."""
+    try:
+        data = request.json()
+        text = data.get('text', '')
+        if not text:
+            return _json({'error': 'No text provided'}, 400)
+
+        filename = await _synthesize(text)
+        return _json({'audio_url': f'/audio/{os.path.basename(filename)}'})
+    except Exception as e:
+        logger.error(f"TTS error: {str(e)}")
+        return _json({'error': 'Text-to-speech generation failed'}, 500)
+
+
+async def tts_stream(request):
+    """
+    Stream text-to-speech audio as it is generated. Cached clips return None
+    so the Flask route serves them with Range and conditional request support.
+    """
+    try:
+        params = request.args if request.method == 'GET' else (request.json() or {})
+        text = params.get('text', '')
+        lang = params.get('lang', 'en')
+        if not text:
+            return _json({'error': 'No text provided'}, 400)
+        if lookup_tts(text, lang, record=False) is not None:
+            return None
+
+        filename, chunks = await _run("tts", stream_tts, text, lang)
+        if chunks is None:
+            return None
+    except Exception as e:
+        logger.error(f"TTS streaming error: {str(e)}")
+        return _json({'error': 'Text-to-speech generation failed'}, 500)
+
+    headers = [
+        ("Content-Type", "audio/mpeg"),
+        ("X-TTS-Cache", "miss"),
+        ("X-Audio-Url", f"/audio/{filename}"),
+    ]
+    return 200, headers, _ExecutorStream(chunks, "tts")
+
+
+async def history(request):
+    """Get or add calculation history through the database executor."""
+    try:
+        if request.method == 'GET':
+            payload, status, etag = await _run("db", _history_get, request.args,
+                                               request.headers.get('if-none-match'))
+            headers = [("ETag", f'"{etag}"'), ("Cache-Control", "no-cache")] if etag else []
+            if payload is None:
+                return status, headers, b""
+            status, base_headers, body = _json(payload, status)
+            return status, base_headers + headers, body
+
+        data = request.json()
+        entry = data.get('entry', '')
+        if not entry:
+            return _json({'error': 'No entry provided'}, 400)
+
+        # The frontend sends "expression = result"
+        expression, separator, result = entry.rpartition(' = ')
+        if not separator:
+            expression, result = entry, ''
+        await _run("db", add_calculation, expression, result, user_id=request.args.get('user_id') or DEFAULT_USER_ID)
+        return _json({'success': True})
+    except Exception as e:
+        logger.error(f"History operation error: {str(e)}")
+        return _json({'error': 'History operation failed'}, 500)
+
+
+async def history_search(request):
+    """Search calculation history through the database executor."""
+    try:
+        return _json(*await _run("db", _history_search, request.args))
+    except Exception as e:
+        logger.error(f"History search error: {str(e)}")
+        return _json({'error': 'History search failed'}, 500)
+
+
+async def _until_disconnect(receive):
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+async def _event_stream(request, subscriber, wake, backlog):
+    """
+    Async counterpart of events_utils.event_stream: waits on the event loop
+    instead of holding a thread, and ends as soon as the client disconnects.
+    """
+    seen = {event[0] for event in backlog}
+    disconnected = asyncio.ensure_future(_until_disconnect(request.receive))
+    try:
+        yield (f"retry: {RETRY_MS}\n\n" + format_events(backlog)).encode("utf-8")
+        while not subscriber.closed:
+            woken = asyncio.ensure_future(wake.wait())
+            done, _ = await asyncio.wait({woken, disconnected}, timeout=HEARTBEAT_INTERVAL,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            woken.cancel()
+            if disconnected in done:
+                break
+            if not done:
+                yield HEARTBEAT.encode("utf-8")
+                continue
+            wake.clear()
+            text = format_events(subscriber.drain(), seen)
+            if text:
+                yield text.encode("utf-8")
+    finally:
+        disconnected.cancel()
+        history_hub.unsubscribe(subscriber)
+
+
+async def history_stream(request):
+    """Push history changes as Server-Sent Events; an idle stream holds no thread."""
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+
+    def notify():
+        try:
+            loop.call_soon_threadsafe(wake.set)
+        except RuntimeError:
+            pass  # The loop has shut down; the stream is gone
+
+    try:
+        subscriber, backlog, error = await _run(
+            "db", _open_history_stream, request.args, request.headers.get('last-event-id'), notify)
+        if error:
+            return _json(*error)
+    except Exception as e:
+        logger.error(f"History stream error: {str(e)}")
+        return _json({'error': 'History stream failed'}, 500)
+
+    headers = [("Content-Type", "text/event-stream; charset=utf-8")] + STREAM_HEADERS
+    return 200, headers, _event_stream(request, subscriber, wake, backlog)
+
+
+# (method, path) -> native handler; everything else goes to Flask
+ROUTES = {
+    ('POST', '/api/calculate'): calculate,
+    ('POST', '/api/voice-process'): voice_process,
+    ('POST', '/api/tts'): tts,
+    ('GET', '/api/tts/stream'): tts_stream,
+    ('POST', '/api/tts/stream'): tts_stream,
+    ('GET', '/api/history'): history,
+    ('POST', '/api/history'): history,
+    ('GET', '/api/history/search'): history_search,
+    ('GET', '/api/history/stream'): history_stream,
+}
+
+
+def _wsgi_environ(scope, body):
+    """Build a PEP 3333 environ for a request passed through to Flask."""
+    server = scope.get("server") or ("localhost", 80)
+    client = scope.get("client") or ("", 0)
+    environ = {
+        "REQUEST_METHOD": scope["method"],
+        "SCRIPT_NAME": scope.get("root_path", "").encode("utf-8").decode("latin-1"),
+        "PATH_INFO": scope["path"].encode("utf-8").decode("latin-1"),
+        "QUERY_STRING": scope.get("query_string", b"").decode("latin-1"),
+        "SERVER_NAME": str(server[0]),
+        "SERVER_PORT": str(server[1]),
+        "REMOTE_ADDR": str(client[0]),
+        "SERVER_PROTOCOL": f"HTTP/{scope.get('http_version', '1.1')}",
+        "wsgi.version": (1, 0),
+        "wsgi.url_scheme": scope.get("scheme", "http"),
+        "wsgi.input": io.BytesIO(body),
+        "wsgi.errors": sys.stderr,
+        "wsgi.multithread": True,
+        "wsgi.multiprocess": False,
+        "wsgi.run_once": False,
+    }
+    for name, value in scope.get("headers", []):
+        name = name.decode("latin-1").upper().replace("-", "_")
+        value = value.decode("latin-1")
+        if name in ("CONTENT_TYPE", "CONTENT_LENGTH"):
+            environ[name] = value
+        else:
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def _start_wsgi(environ):
+    """Call the Flask app and return its status, headers, iterable and first chunk."""
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started["status"] = int(status.split(" ", 1)[0])
+        started["headers"] = headers
+
+    iterable = flask_app(environ, start_response)
+    iterator = iter(iterable)
+    first = next(iterator, b"")
+    return started["status"], started["headers"], iterable, iterator, first
+
+
+async def _send_response(send, status, headers, body):
+    """Send a response whose body is bytes or an async iterator of bytes."""
+    if isinstance(body, bytes):
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                                for name, value in headers]})
+        await send({"type": "http.response.body", "body": body})
+        return
+    try:
+        await send({"type": "http.response.start", "status": status,
+                    "headers": [(name.lower().encode("latin-1"), value.encode("latin-1"))
+                                for name, value in headers]})
+        async for chunk in body:
+            if chunk:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        await body.aclose()
+
+
+async def _read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise ConnectionError("Client disconnected before sending the body")
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, startup)
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            for executor in _executors.values():
+                executor.shutdown(wait=True)
+            stop_eval_pool()
+            close_db()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """ASGI application: native async routes first, Flask for the rest."""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    started = time.perf_counter()
+    try:
+        body = await _read_body(receive)
+    except ConnectionError:
+        return
+
+    handler = ROUTES.get((scope["method"], scope["path"]))
+    response = await handler(_Request(scope, body, receive)) if handler is not None else None
+    if response is None:
+        # Flask's own hooks record the latency of passed-through requests
+        status, headers, iterable, iterator, first = await _run(
+            "wsgi", _start_wsgi, _wsgi_environ(scope, body))
+        await _send_response(send, status, headers, _ExecutorStream(iterable, "wsgi", iterator, first))
+        return
+
+    status, headers, response_body = response
+    try:
+        await _send_response(send, status, headers, response_body)
+    finally:
+        observe_request(scope["path"], scope["method"], status, time.perf_counter() - started)
+
+
+if __name__ == '__main__':
+    try:
+        import uvicorn
+    except ImportError:
+        sys.exit("asgi.py needs an ASGI server: pip install uvicorn (or run it with hypercorn/daphne)")
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
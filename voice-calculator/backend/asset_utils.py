@@ -0,0 +1,174 @@
+"""
+Static asset utilities for Voice Calculator application.
+Loads the frontend once at startup: every file is hashed and precompressed
+(gzip, and brotli when installed) in memory, and index.html is rewritten to
+point at fingerprinted URLs that can be cached forever. No build step.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+
+try:
+    import brotli
+except ImportError:  # Optional; assets are served gzip-compressed only
+    brotli = None
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+ASSET_DIR = os.path.join(os.path.dirname(__file__), "..", "frontend")
+ASSET_PREFIX = "/assets/"  # URL prefix of fingerprinted assets
+INDEX_FILE = "index.html"
+FINGERPRINT_LENGTH = 12  # Hex digits of the content hash used in URLs and ETags
+COMPRESS_MIN_SIZE = 256  # Bytes; smaller files are not worth compressing
+GZIP_LEVEL = 9  # Compression happens once at startup, so use the best ratio
+BROTLI_QUALITY = 11
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"  # Fingerprinted URLs never change content
+REVALIDATE_CACHE = "no-cache"  # index.html and plain URLs: reuse only after an ETag check
+
+# Content codings, most preferred first
+IDENTITY = "identity"
+ENCODINGS = ["br", "gzip"]
+
+_REFERENCE = re.compile(r"""(\b(?:src|href)=)(["'])([^"'#?]+)\2""")  # Attribute URLs in index.html
+_EXTERNAL = re.compile(r"^(?:[a-zA-Z][a-zA-Z0-9+.-]*:|//)")  # URLs with a scheme or host
+
+
+class Asset:
+    """One frontend file with its fingerprint and precompressed bodies."""
+
+    def __init__(self, path, data, content_type=None):
+        """
+        Args:
+            path (str): Path relative to the asset directory, with forward slashes
+            data (bytes): File contents
+            content_type (str): MIME type (guessed from the path if omitted)
+        """
+        self.path = path
+        self.digest = hashlib.sha256(data).hexdigest()[:FINGERPRINT_LENGTH]
+        stem, ext = posixpath.splitext(path)
+        self.url = f"{ASSET_PREFIX}{stem}.{self.digest}{ext}"
+        content_type = content_type or mimetypes.guess_type(path)[0] or "application/octet-stream"
+        if content_type.startswith("text/") or content_type in ("application/javascript", "application/json"):
+            content_type += "; charset=utf-8"
+        self.content_type = content_type
+        self.bodies = {IDENTITY: data}
+        if len(data) >= COMPRESS_MIN_SIZE:
+            compressed = {"gzip": gzip.compress(data, GZIP_LEVEL, mtime=0)}  # mtime=0: same bytes every start
+            if brotli is not None:
+                compressed["br"] = brotli.compress(data, quality=BROTLI_QUALITY)
+            for encoding, body in compressed.items():
+                if len(body) < len(data):
+                    self.bodies[encoding] = body
+
+    def etag(self, encoding=IDENTITY):
+        """Strong ETag of one encoding; each encoding is a different representation."""
+        return self.digest if encoding == IDENTITY else f"{self.digest}-{encoding}"
+
+    def negotiate(self, accept_encoding):
+        """
+        Pick the encoding to send for an Accept-Encoding header.
+
+        Returns:
+            str: A key of bodies, the best encoding the client accepts
+        """
+        accepted = {}
+        for item in (accept_encoding or "").split(","):
+            coding, _, params = item.strip().partition(";")
+            quality = 1.0
+            name, _, value = params.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+            accepted[coding.strip().lower()] = quality
+        for encoding in ENCODINGS:
+            if encoding in self.bodies and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+                return encoding
+        return IDENTITY
+
+
+class AssetManifest:
+    """All assets of a directory, by plain path and by fingerprinted URL, plus the rewritten index."""
+
+    def __init__(self, directory=ASSET_DIR):
+        self.directory = directory
+        self.assets = {}  # path relative to directory -> Asset
+        self.by_url = {}  # fingerprinted URL -> Asset
+        self.index = None  # Asset of the rewritten index.html
+        self._mtimes = {}
+        self._load()
+
+    def _load(self):
+        """Hash and compress every file, then rewrite index.html to fingerprinted URLs."""
+        for root, dirs, files in os.walk(self.directory):
+            dirs.sort()
+            for name in sorted(files):
+                full_path = os.path.join(root, name)
+                path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+                with open(full_path, "rb") as f:
+                    data = f.read()
+                self._mtimes[full_path] = os.path.getmtime(full_path)
+                if path != INDEX_FILE:
+                    asset = Asset(path, data)
+                    self.assets[path] = self.by_url[asset.url] = asset
+
+        index_path = os.path.join(self.directory, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as f:
+                html = _REFERENCE.sub(self._rewrite, f.read())
+            self.index = Asset(INDEX_FILE, html.encode("utf-8"))
+        logger.info(f"Loaded {len(self.assets)} static assets from {os.path.abspath(self.directory)}")
+
+    def _rewrite(self, match):
+        """Point one src/href attribute at its asset's fingerprinted URL, if it names one."""
+        prefix, quote, url = match.groups()
+        asset = None if _EXTERNAL.match(url) else self.assets.get(posixpath.normpath(url.lstrip("/")))
+        return f"{prefix}{quote}{asset.url if asset else url}{quote}"
+
+    def stale(self):
+        """Return True if a file was added, removed or modified since loading."""
+        current = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                full_path = os.path.join(root, name)
+                current[full_path] = os.path.getmtime(full_path)
+        return current != self._mtimes
+
+    def stats(self):
+        """Return asset counts and in-memory sizes per encoding."""
+        assets = list(self.assets.values()) + ([self.index] if self.index else [])
+        sizes = {}
+        for asset in assets:
+            for encoding, body in asset.bodies.items():
+                sizes[encoding] = sizes.get(encoding, 0) + len(body)
+        return {"assets": len(assets), "bytes": sizes, "brotli": brotli is not None}
+
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+def get_assets(reload=False):
+    """
+    Return the asset manifest of ASSET_DIR, loading it on first use.
+
+    Args:
+        reload (bool): Reload if any file changed on disk (for development)
+    """
+    global _manifest
+    manifest = _manifest
+    if manifest is not None and manifest.directory == ASSET_DIR and not (reload and manifest.stale()):
+        return manifest
+    with _manifest_lock:
+        if _manifest is None or _manifest is manifest:
+            _manifest = AssetManifest(ASSET_DIR)
+        return _manifest
@@ -0,0 +1,141 @@
+"""
+Benchmark for the ASGI serving mode.
+Runs many concurrent voice sessions (voice-process then tts) against the ASGI
+app in-process, and the same sessions against the Flask app from a fixed
+pool of threads as a threaded WSGI server would, with the fake TTS engine.
+
+Usage:
+    python benchmarks/bench_asgi.py [--sessions N] [--distinct N] [--threads N] [--latency SECONDS]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_tts import FakeTTSBackend
+
+
+def _session_requests(i, distinct, run):
+    return [
+        ("/api/voice-process", {"transcript": f"{i} plus {i}"}),
+        ("/api/tts", {"text": f"Run {run}: the result is {i % distinct}"}),
+    ]
+
+
+async def _asgi_call(app, path, body):
+    """Send one JSON POST straight to the ASGI callable and return the status."""
+    raw = json.dumps(body).encode("utf-8")
+    scope = {"type": "http", "method": "POST", "path": path, "query_string": b"",
+             "headers": [(b"content-type", b"application/json")], "http_version": "1.1"}
+    received = False
+
+    async def receive():
+        nonlocal received
+        if not received:
+            received = True
+            return {"type": "http.request", "body": raw, "more_body": False}
+        await asyncio.Event().wait()
+
+    status = None
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+
+    await app(scope, receive, send)
+    return status
+
+
+class _PeakThreads:
+    """Samples threading.active_count() in the background."""
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_asgi(asgi_app, sessions, distinct):
+    async def session(i):
+        return [await _asgi_call(asgi_app, path, body) for path, body in _session_requests(i, distinct, "asgi")]
+
+    async def all_sessions():
+        return await asyncio.gather(*(session(i) for i in range(sessions)))
+
+    with _PeakThreads() as threads:
+        start = time.perf_counter()
+        statuses = asyncio.run(all_sessions())
+        elapsed = time.perf_counter() - start
+    return elapsed, threads.peak, statuses
+
+
+def run_threaded(flask_app, sessions, distinct, pool_size):
+    client = flask_app.test_client()
+
+    def session(i):
+        return [client.post(path, json=body).status_code for path, body in _session_requests(i, distinct, "wsgi")]
+
+    with _PeakThreads() as threads:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(pool_size) as pool:
+            statuses = list(pool.map(session, range(sessions)))
+        elapsed = time.perf_counter() - start
+    return elapsed, threads.peak, statuses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=300)
+    parser.add_argument("--distinct", type=int, default=100, help="distinct spoken results")
+    parser.add_argument("--threads", type=int, default=16, help="threads of the WSGI comparison")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake synthesis time, seconds")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        import db_utils
+        import tts_utils
+        db_utils.DB_PATH = os.path.join(tmp, "history.db")
+        tts_utils.VOICE_DIR = tmp
+        backend = FakeTTSBackend(latency=args.latency)
+        tts_utils.set_tts_backend(backend)
+        tts_utils.logger.setLevel("WARNING")
+
+        import app
+        import asgi
+        app.warm_up()
+
+        print(f"sessions: {args.sessions}, distinct phrases: {args.distinct}, "
+              f"synthesis latency: {args.latency * 1000:.0f} ms")
+        print(f"{'mode':<22} {'wall s':>8} {'sessions/s':>11} {'syntheses':>10} {'peak threads':>13}")
+        for label, run in ((f"threaded WSGI ({args.threads})", lambda: run_threaded(
+                                app.app, args.sessions, args.distinct, args.threads)),
+                           ("ASGI", lambda: run_asgi(asgi.app, args.sessions, args.distinct))):
+            backend.calls = 0
+            elapsed, peak, statuses = run()
+            assert all(status == 200 for session in statuses for status in session), statuses
+            print(f"{label:<22} {elapsed:>8.2f} {args.sessions / elapsed:>11.1f} {backend.calls:>10} {peak:>13}")
+        db_utils.close_db()
+
+
+if __name__ == "__main__":
+    main()
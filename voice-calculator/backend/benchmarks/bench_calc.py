@@ -0,0 +1,84 @@
+"""
+Benchmark for the calculation engine.
+Compares the fast numeric path against plain `float(sympify(...))` on a
+realistic mix of calculator expressions.
+
+Usage:
+    python benchmarks/bench_calc.py [--rounds N]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sympy import sympify
+
+from calc_utils import evaluate, fast_evaluate, UnsupportedExpression
+
+# Mix of keypad input, voice output and the occasional symbolic expression
+EXPRESSIONS = [
+    "2+3*4",
+    "12.5*8",
+    "100/7",
+    "(45+55)*2",
+    "2^10",
+    "3**3-1",
+    "17%5",
+    "-4+2.25",
+    "1/3+1/6",
+    "sqrt(144)+1",
+    "sin(pi/6)",
+    "log(100, 10)",
+    "exp(2)*3",
+    "factorial(6)",
+    "(1+2)*(3+4)/(5-6)",
+    "0.1+0.2",
+    "1234567*89",
+    "abs(-42)",
+    "x+1",           # SymPy fallback (free symbol, invalid)
+    "sqrt(-1)",      # SymPy fallback (complex result)
+]
+
+
+def _time(func, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for expression in EXPRESSIONS:
+            try:
+                func(expression)
+            except Exception:
+                pass
+    return time.perf_counter() - start
+
+
+def _sympy_only(expression):
+    return float(sympify(expression))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    fast_count = 0
+    for expression in EXPRESSIONS:
+        try:
+            fast_evaluate(expression)
+            fast_count += 1
+        except UnsupportedExpression:
+            pass
+
+    calls = args.rounds * len(EXPRESSIONS)
+    sympy_time = _time(_sympy_only, args.rounds)
+    engine_time = _time(evaluate, args.rounds)
+
+    print(f"expressions: {len(EXPRESSIONS)} ({fast_count} on fast path), calls: {calls}")
+    print(f"sympy only : {sympy_time:8.3f}s  {calls / sympy_time:10.0f} ops/s")
+    print(f"evaluate() : {engine_time:8.3f}s  {calls / engine_time:10.0f} ops/s")
+    print(f"speedup    : {sympy_time / engine_time:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Load benchmark for history storage.
+Measures ops/sec of `add_calculation` and `get_calculation_history` with the
+pooled WAL connection layer (and write-behind inserts) against the previous
+connect-per-call approach, using temporary database files and a configurable number of threads.
+
+Usage:
+    python benchmarks/bench_db.py [--ops N] [--threads N] [--max-history N]
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_utils
+
+
+def _legacy_connection(path):
+    """Open a connection the way db_utils did before pooling."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=db_utils.BUSY_TIMEOUT)
+    conn.row_factory = sqlite3.Row
+    db_utils._initialize_db(conn)
+    return conn
+
+
+def legacy_add_calculation(path, expression, result):
+    conn = _legacy_connection(path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO calculation_history (expression, result, timestamp, voice_input)
+            VALUES (?, ?, ?, ?)
+        ''', (expression, result, datetime.now().isoformat(), 0))
+        cursor.execute('''
+            DELETE FROM calculation_history
+            WHERE id IN (
+                SELECT id FROM calculation_history
+                ORDER BY timestamp DESC
+                LIMIT -1 OFFSET ?
+            )
+        ''', (db_utils.MAX_HISTORY_ENTRIES,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def legacy_get_calculation_history(path):
+    conn = _legacy_connection(path)
+    try:
+        return [dict(row) for row in conn.execute(
+            'SELECT * FROM calculation_history ORDER BY timestamp DESC').fetchall()]
+    finally:
+        conn.close()
+
+
+def _run(func, ops, threads):
+    """Call func(i) ops times across a thread pool and return ops/sec."""
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(func, range(ops)))
+    return ops / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--max-history", type=int, default=db_utils.MAX_HISTORY_ENTRIES)
+    args = parser.parse_args()
+
+    db_utils.MAX_HISTORY_ENTRIES = args.max_history
+    db_utils.logger.setLevel("WARNING")
+    with tempfile.TemporaryDirectory() as tmp:
+        legacy_path = os.path.join(tmp, "legacy", "history.db")
+        db_utils.DB_PATH = os.path.join(tmp, "pooled", "history.db")
+        db_utils.init_db()
+
+        results = [
+            ("add_calculation", "legacy",
+             _run(lambda i: legacy_add_calculation(legacy_path, f"{i}+1", str(i + 1)), args.ops, args.threads)),
+            ("add_calculation", "pooled",
+             _run(lambda i: db_utils.add_calculation(f"{i}+1", str(i + 1)), args.ops, args.threads)),
+        ]
+        db_utils.start_write_behind()
+        results += [
+            ("add_calculation", "queued",
+             _run(lambda i: db_utils.add_calculation(f"{i}+1", str(i + 1)), args.ops, args.threads)),
+        ]
+        db_utils.stop_write_behind()
+        results += [
+            ("get_calculation_history", "legacy",
+             _run(lambda i: legacy_get_calculation_history(legacy_path), args.ops, args.threads)),
+            ("get_calculation_history", "pooled",
+             _run(lambda i: db_utils.get_calculation_history(), args.ops, args.threads)),
+        ]
+        db_utils.close_db()
+
+    print(f"ops: {args.ops}, threads: {args.threads}, max history: {args.max_history}")
+    for operation, mode, rate in results:
+        print(f"{operation:<25} {mode:<7} {rate:10.0f} ops/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Benchmark for full-text history search.
+Builds a synthetic history (1M rows by default, spread over many users and
+about a year of timestamps) through the normal schema and triggers, then
+reports search_history latency for selective, broad, prefix, per-user and
+date-range queries.
+
+Usage:
+    python benchmarks/bench_search.py [--rows N] [--users N] [--runs N] [--db PATH] [--target MS]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_utils
+
+FUNCTIONS = ["sqrt", "sin", "cos", "log", "exp", "tan"]
+LABELS = ["mortgage", "rent", "salary", "tip", "tax"]
+START = datetime(2025, 1, 1)
+INSERT_BATCH = 50000
+
+# (label, search_history keyword arguments)
+QUERIES = [
+    ("selective word", {"query": "mortgage"}),
+    ("word and decimal", {"query": "mortgage 0.045"}),
+    ("broad word, ranked", {"query": "sqrt"}),
+    ("broad word, recent", {"query": "sqrt", "order": "recent"}),
+    ("2-char prefix, ranked", {"query": "12"}),
+    ("5-char prefix, ranked", {"query": "12345"}),
+    ("broad word, one user", {"query": "sqrt", "user_id": "user7"}),
+    ("broad word, one week", {"query": "sqrt", "since": "2025-03-01", "until": "2025-03-08"}),
+    ("selective, one week", {"query": "mortgage", "since": "2025-03-01", "until": "2025-03-08"}),
+    ("no match", {"query": "nothing"}),
+]
+
+
+def _expression(rng):
+    kind = rng.random()
+    if kind < 0.01:
+        return f"{rng.choice(LABELS)} {rng.randint(100, 900) * 1000}*{rng.choice(['0.035', '0.045', '0.055'])}/12"
+    if kind < 0.3:
+        return f"{rng.choice(FUNCTIONS)}({rng.randint(1, 999)})*{rng.randint(1, 99)}"
+    return f"{rng.randint(1, 99999)}{rng.choice('+-*/')}{rng.randint(1, 99999)}"
+
+
+def build_history(rows, users, seed=1):
+    """Insert synthetic rows, 30 seconds apart, in large transactions."""
+    rng = random.Random(seed)
+    with db_utils.get_db_connection() as conn:
+        for batch_start in range(0, rows, INSERT_BATCH):
+            batch = range(batch_start, min(rows, batch_start + INSERT_BATCH))
+            conn.executemany('''
+                INSERT INTO calculation_history (expression, result, timestamp, voice_input, user_id)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(_expression(rng), str(rng.randint(1, 10 ** 6)), (START + timedelta(seconds=30 * i)).isoformat(),
+                   int(rng.random() < 0.2), f"user{i % users}") for i in batch])
+            conn.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--runs", type=int, default=50, help="timed runs per query")
+    parser.add_argument("--db", help="keep the synthetic database here and reuse it on later runs")
+    parser.add_argument("--target", type=float, default=10.0, help="p95 latency budget per query, ms")
+    args = parser.parse_args()
+
+    db_utils.logger.setLevel("WARNING")
+    with tempfile.TemporaryDirectory() as tmp:
+        db_utils.DB_PATH = args.db or os.path.join(tmp, "history.db")
+        reuse = os.path.exists(db_utils.DB_PATH)
+        db_utils.init_db()
+        if not reuse:
+            started = time.perf_counter()
+            build_history(args.rows, args.users)
+            print(f"built {args.rows} rows in {time.perf_counter() - started:.1f}s")
+        with db_utils.get_db_connection() as conn:
+            rows = conn.execute("SELECT COUNT(*) FROM calculation_history").fetchone()[0]
+
+        print(f"rows: {rows}, runs per query: {args.runs}, rank window: {db_utils.SEARCH_RANK_WINDOW}")
+        print(f"{'query':<24} {'results':>8} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+        over_budget = []
+        for label, kwargs in QUERIES:
+            results, _ = db_utils.search_history(**kwargs)  # Warm the page cache
+            timings = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                db_utils.search_history(**kwargs)
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+            print(f"{label:<24} {len(results):>8} {statistics.median(timings):>8.2f} {p95:>8.2f} {timings[-1]:>8.2f}")
+            if p95 > args.target:
+                over_budget.append(label)
+        db_utils.close_db()
+
+    if over_budget:
+        print(f"over the {args.target:g} ms p95 budget: {', '.join(over_budget)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark for sharded history writes.
+Runs concurrent writer processes, as a multi-worker server would, each
+adding history entries synchronously for many users, against 1, 2, 4 and 8
+history shards, and reports committed inserts per second.
+
+Usage:
+    python benchmarks/bench_shards.py [--shards 1,2,4,8] [--workers N] [--writes N] [--users N]
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db_utils
+
+
+def _writer(db_path, shards, writes, users, seed, start):
+    db_utils.logger.setLevel("WARNING")
+    db_utils.DB_PATH = db_path
+    db_utils.configure_history_shards(shards)
+    db_utils.init_db()
+    rng = random.Random(seed)
+    start.wait()
+    for i in range(writes):
+        db_utils.add_calculation(f"{i}+{seed}", str(i + seed), user_id=f"user{rng.randrange(users)}")
+    db_utils.close_db()
+
+
+def run(db_path, shards, workers, writes, users):
+    """Return committed inserts per second with workers writing in parallel."""
+    db_utils.DB_PATH = db_path
+    db_utils.configure_history_shards(shards)
+    db_utils.init_db()  # Create the schema before the writers race for it
+    db_utils.close_db()
+
+    start = multiprocessing.Event()
+    processes = [multiprocessing.Process(target=_writer, args=(db_path, shards, writes, users, seed, start))
+                 for seed in range(workers)]
+    for process in processes:
+        process.start()
+    time.sleep(0.5)  # Let every worker open its connections
+    started = time.perf_counter()
+    start.set()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    if any(process.exitcode for process in processes):
+        raise RuntimeError("a writer process failed")
+    return workers * writes / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", default="1,2,4,8", help="comma-separated shard counts")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="writer processes")
+    parser.add_argument("--writes", type=int, default=2000, help="inserts per writer")
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    db_utils.logger.setLevel("WARNING")
+    counts = [int(count) for count in args.shards.split(",")]
+    print(f"writers: {args.workers}, inserts per writer: {args.writes}, users: {args.users}")
+    print(f"{'shards':>6} {'inserts/s':>10} {'speed-up':>9}")
+    baseline = None
+    for shards in counts:
+        with tempfile.TemporaryDirectory() as tmp:
+            rate = run(os.path.join(tmp, "history.db"), shards, args.workers, args.writes, args.users)
+        baseline = baseline or rate
+        print(f"{shards:>6} {rate:>10.0f} {rate / baseline:>8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Benchmark for application startup.
+Starts a fresh interpreter per run and reports how long `import app` takes,
+the optional warm-up, and the time to the first successful /api/calculate
+response for a fast-path and a SymPy expression.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs N] [--warm-up] [--workers N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child interpreter; prints one JSON line of timings
+CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import db_utils
+db_utils.DB_PATH = sys.argv[1]
+import app
+timings = {"import": time.perf_counter() - started}
+if sys.argv[2] == "1":
+    mark = time.perf_counter()
+    app.warm_up()
+    timings["warm_up"] = time.perf_counter() - mark
+client = app.app.test_client()
+for label, expression in (("fast", "2+3*4"), ("sympy", "sqrt(2)*pi + x - x")):
+    mark = time.perf_counter()
+    response = client.post("/api/calculate", json={"expression": expression})
+    assert response.status_code == 200, response.get_json()
+    timings[label] = time.perf_counter() - mark
+timings["total"] = time.perf_counter() - started
+print(json.dumps(timings))
+"""
+
+
+def _run(warm_up, workers):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ, EVAL_POOL_WORKERS=str(workers), WARM_UP="False")
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD, os.path.join(tmp, "history.db"), "1" if warm_up else "0"],
+            cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+        ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm-up", action="store_true", help="call app.warm_up() before the first request")
+    parser.add_argument("--workers", type=int, default=2, help="evaluation worker processes (0 = inline)")
+    args = parser.parse_args()
+
+    runs = [_run(args.warm_up, args.workers) for _ in range(args.runs)]
+
+    print(f"runs: {args.runs}, warm-up: {'yes' if args.warm_up else 'no'}, workers: {args.workers}")
+    print("median seconds:")
+    for key, label in (("import", "import app"), ("warm_up", "warm_up()"),
+                       ("fast", "first fast-path response"), ("sympy", "first SymPy response"),
+                       ("total", "start to both responses")):
+        if key in runs[0]:
+            print(f"  {label:<26}: {statistics.median(run[key] for run in runs):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Benchmark for concurrent batch TTS generation.
+Runs `generate_tts_batch` against the local fake engine with an artificial
+synthesis latency and shows wall-clock time as the pool size grows.
+
+Usage:
+    python benchmarks/bench_tts.py [--items N] [--latency SECONDS]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import tts_utils
+from fake_tts import FakeTTSBackend
+
+POOL_SIZES = [1, 2, 4, 8, 16]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=32)
+    parser.add_argument("--latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    tts_utils.logger.setLevel("WARNING")
+    with tempfile.TemporaryDirectory() as tmp:
+        tts_utils.VOICE_DIR = tmp
+        backend = FakeTTSBackend(latency=args.latency)
+        tts_utils.set_tts_backend(backend)
+
+        print(f"items: {args.items} (half duplicates), latency: {args.latency * 1000:.0f} ms")
+        print(f"{'workers':>8} {'wall s':>8} {'syntheses':>10} {'speedup':>8}")
+        baseline = None
+        for workers in POOL_SIZES:
+            # Fresh texts per run so the content-addressed cache doesn't hide the work
+            texts = [f"run {workers} item {i % (args.items // 2)}" for i in range(args.items)]
+            backend.calls = 0
+            start = time.perf_counter()
+            results = tts_utils.generate_tts_batch(texts, max_workers=workers, timeout=600)
+            elapsed = time.perf_counter() - start
+            assert all(item["error"] is None for item in results)
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>8.3f} {backend.calls:>10} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
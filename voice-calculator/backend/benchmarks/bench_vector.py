@@ -0,0 +1,51 @@
+"""
+Benchmark for vectorized evaluation.
+Compares `evaluate_vectorized` (one lambdified NumPy call) against evaluating
+the expression point by point with `sympify`, as separate /api/calculate
+calls would.
+
+Usage:
+    python benchmarks/bench_vector.py [--points N]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sympy import sympify
+
+from calc_utils import evaluate_vectorized
+
+EXPRESSIONS = ["x^2 + 3", "sin(x)*exp(-x/100)", "sqrt(x)/(1 + log(x))"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--points", type=int, default=1000)
+    args = parser.parse_args()
+
+    bindings = {"x": {"from": 1, "to": args.points}}
+    print(f"points: {args.points}")
+    print(f"{'expression':<24} {'per-point s':>12} {'first call s':>13} {'cached s':>9} {'speedup':>9}")
+    for expression in EXPRESSIONS:
+        start = time.perf_counter()
+        loop = [float(sympify(re.sub(r"\bx\b", f"({x})", expression))) for x in range(1, args.points + 1)]
+        per_point = time.perf_counter() - start
+
+        # First call includes compilation; it is cached for later requests
+        start = time.perf_counter()
+        result = evaluate_vectorized(expression, bindings)
+        first_call = time.perf_counter() - start
+        start = time.perf_counter()
+        evaluate_vectorized(expression, bindings)
+        cached = time.perf_counter() - start
+
+        assert all(abs(a - b) <= 1e-9 * max(1.0, abs(a)) for a, b in zip(loop, result["values"]))
+        print(f"{expression:<24} {per_point:>12.3f} {first_call:>13.4f} {cached:>9.4f} {per_point / cached:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main()
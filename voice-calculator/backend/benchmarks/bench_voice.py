@@ -0,0 +1,77 @@
+"""
+Micro-benchmark for voice transcript cleaning.
+Compares the whole-word phrase pass in `clean_voice_input` with the
+previous one-`str.replace`-per-phrase loop across transcript lengths and
+phrase-table sizes, for transcripts with and without spoken numbers (the
+number pass only runs when a number word is present).
+
+Usage:
+    python benchmarks/bench_voice.py [--rounds N]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ai_utils import VOICE_REPLACEMENTS, build_phrase_table, clean_voice_input
+
+SENTENCES = {
+    "words": "twenty three point five plus seven times two to the power of three minus forty two over six ",
+    "digits": "23.5 plus 7 times 2 to the power of 3 minus 42 over 6 ",
+}
+LENGTHS = [1, 4, 16, 64]
+TABLE_SIZES = [len(VOICE_REPLACEMENTS), 100, 1000]
+
+
+def legacy_clean_voice_input(text, replacements):
+    """The original replace loop, kept here as the baseline."""
+    text = text.lower()
+    for word, symbol in replacements.items():
+        text = text.replace(word, symbol)
+    text = re.sub(r"[^0-9a-zA-Z+\-*/().%^ ]", "", text)
+    return text.strip()
+
+
+def _table(size):
+    """Pad the real phrase table with synthetic two-word phrases."""
+    replacements = dict(VOICE_REPLACEMENTS)
+    i = 0
+    while len(replacements) < size:
+        replacements[f"synthetic{i} phrase"] = "+"
+        i += 1
+    return replacements
+
+
+def _time(func, rounds, repeat=5):
+    """Best of several runs, in microseconds per call."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            func()
+        best = min(best, time.perf_counter() - start)
+    return best / rounds * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'phrases':>8} {'numbers':>8} {'chars':>7} {'legacy us':>11} {'new us':>8}")
+    for size in TABLE_SIZES:
+        replacements = _table(size)
+        table = build_phrase_table(replacements)
+        for numbers, sentence in SENTENCES.items():
+            for length in LENGTHS:
+                text = sentence * length
+                legacy = _time(lambda: legacy_clean_voice_input(text, replacements), args.rounds)
+                new = _time(lambda: clean_voice_input(text, table), args.rounds)
+                print(f"{size:>8} {numbers:>8} {len(text):>7} {legacy:>11.1f} {new:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
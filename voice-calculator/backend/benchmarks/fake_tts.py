@@ -0,0 +1,34 @@
+"""
+Local fake TTS engine for benchmarks.
+Stands in for gTTS via `tts_utils.set_tts_backend` so runs need no network.
+"""
+import time
+
+
+class FakeTTSBackend:
+    """Writes a small placeholder mp3 after an artificial synthesis delay."""
+
+    def __init__(self, latency=0.05, fail_on=()):
+        """
+        Args:
+            latency (float): Seconds each synthesis takes
+            fail_on (iterable): Texts that raise instead of producing audio
+        """
+        self.latency = latency
+        self.fail_on = set(fail_on)
+        self.calls = 0
+
+    def __call__(self, text, lang, slow, path):
+        with open(path, "wb") as f:
+            for chunk in self.stream(text, lang, slow):
+                f.write(chunk)
+
+    def stream(self, text, lang, slow, parts=4):
+        """Yield one silent mp3 frame per part, spreading the latency across them."""
+        self.calls += 1
+        for _ in range(parts):
+            time.sleep(self.latency / parts)
+            if text in self.fail_on:
+                raise RuntimeError(f"fake synthesis failure for '{text}'")
+            # MPEG-1 Layer III frame header followed by silence
+            yield b"\xff\xfb\x90\x00" + b"\x00" * 413
@@ -0,0 +1,261 @@
+"""
+Load test for the Flask API.
+Serves the app over HTTP with the local fake TTS engine and a temporary
+SQLite database, drives the main endpoints from concurrent clients and
+reports throughput and p50/p95/p99 latency per scenario. Results can be
+saved as a JSON baseline and compared against a later run.
+
+Usage:
+    python benchmarks/load_test.py [--scenarios calculate,voice,history,tts]
+        [--requests N] [--concurrency N] [--save FILE] [--compare FILE]
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timezone
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from fake_tts import FakeTTSBackend
+from bench_calc import EXPRESSIONS
+
+# Spoken input as it arrives from the browser's speech recognition
+TRANSCRIPTS = [
+    "two plus three",
+    "twelve times four",
+    "one hundred divided by seven",
+    "five squared",
+    "nine cubed minus one",
+    "forty two mod five",
+    "three point five times two",
+    "seven hundred and twenty plus one thousand",
+    "x times x plus two times x",
+    "open bracket one plus two close bracket times three",
+    "fifty percent",
+    "two to the power of ten",
+]
+
+# Scenario name -> (method, path) of the endpoint it drives
+SCENARIOS = {
+    "calculate": ("POST", "/api/calculate"),
+    "voice": ("POST", "/api/voice-process"),
+    "history": ("GET|POST", "/api/history"),
+    "tts": ("POST", "/api/tts"),
+}
+
+HISTORY_WRITE_SHARE = 0.2  # Share of history requests that add an entry
+TTS_DISTINCT_RESULTS = 200  # Spoken results are drawn from this many numbers
+
+
+def _next_request(scenario, rng):
+    """Return (method, path, JSON body or None) for one request of a scenario."""
+    if scenario == "calculate":
+        return "POST", "/api/calculate", {"expression": rng.choice(EXPRESSIONS)}
+    if scenario == "voice":
+        return "POST", "/api/voice-process", {"transcript": rng.choice(TRANSCRIPTS)}
+    if scenario == "history":
+        if rng.random() < HISTORY_WRITE_SHARE:
+            a, b = rng.randint(1, 999), rng.randint(1, 999)
+            return "POST", "/api/history", {"entry": f"{a}+{b} = {a + b}"}
+        return "GET", "/api/history", None
+    if scenario == "tts":
+        return "POST", "/api/tts", {"text": f"The result is {rng.randrange(TTS_DISTINCT_RESULTS)}"}
+    raise ValueError(f"Unknown scenario '{scenario}'")
+
+
+def _client(port, scenario, count, seed, latencies, statuses, lock):
+    """Send count requests over one keep-alive connection, recording each latency."""
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    local_latencies, local_statuses = [], {}
+    for _ in range(count):
+        method, path, body = _next_request(scenario, rng)
+        payload = json.dumps(body) if body is not None else None
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=payload, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            status = "error"
+        local_latencies.append(time.perf_counter() - start)
+        local_statuses[status] = local_statuses.get(status, 0) + 1
+    conn.close()
+    with lock:
+        latencies.extend(local_latencies)
+        for status, n in local_statuses.items():
+            statuses[status] = statuses.get(status, 0) + n
+
+
+def _percentile(ordered, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def run_scenario(port, scenario, requests, concurrency, seed):
+    """
+    Drive one scenario with concurrent clients.
+
+    Returns:
+        dict: Request count, wall time, throughput, latency percentiles (ms)
+            and response counts by class
+    """
+    latencies, statuses, lock = [], {}, threading.Lock()
+    per_client = [requests // concurrency + (1 if i < requests % concurrency else 0)
+                  for i in range(concurrency)]
+    threads = [threading.Thread(target=_client, args=(port, scenario, n, seed + i, latencies, statuses, lock))
+               for i, n in enumerate(per_client) if n]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "seconds": round(elapsed, 4),
+        "throughput": round(len(ordered) / elapsed, 2),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": round(_percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(_percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(_percentile(ordered, 0.99) * 1000, 3),
+        "ok": sum(n for status, n in statuses.items() if status != "error" and status < 400),
+        "client_errors": sum(n for status, n in statuses.items() if status != "error" and 400 <= status < 500),
+        "errors": sum(n for status, n in statuses.items() if status == "error" or status >= 500),
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(baseline, current, tolerance):
+    """
+    Print per-scenario changes against a baseline.
+
+    Returns:
+        list: Scenarios whose throughput dropped or p95 latency rose by more than tolerance
+    """
+    regressions = []
+    print(f"\ncompared with {baseline.get('commit') or 'baseline'} ({baseline.get('created')}):")
+    print(f"{'scenario':<10} {'throughput':>12} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for scenario, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(scenario)
+        if before is None:
+            continue
+
+        def change(key):
+            return (result[key] - before[key]) / before[key] if before[key] else 0.0
+
+        print(f"{scenario:<10} {change('throughput'):>+11.1%} {change('p50_ms'):>+8.1%} "
+              f"{change('p95_ms'):>+8.1%} {change('p99_ms'):>+8.1%}")
+        if change("throughput") < -tolerance or change("p95_ms") > tolerance:
+            regressions.append(scenario)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated, from: {', '.join(SCENARIOS)}")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent client connections")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per scenario first")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--tts-latency", type=float, default=0.05, help="fake synthesis time, seconds")
+    parser.add_argument("--workers", type=int, default=2, help="evaluation worker processes (0 = inline)")
+    parser.add_argument("--save", metavar="FILE", help="write results as a JSON baseline")
+    parser.add_argument("--compare", metavar="FILE", help="compare with a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="relative change counted as a regression (default 0.2)")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    os.environ["EVAL_POOL_WORKERS"] = str(args.workers)
+    os.environ["WARM_UP"] = "False"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        import db_utils
+        import tts_utils
+        db_utils.DB_PATH = os.path.join(tmp, "history.db")
+        tts_utils.VOICE_DIR = os.path.join(tmp, "voice")
+        os.makedirs(tts_utils.VOICE_DIR)
+        tts_utils.set_tts_backend(FakeTTSBackend(latency=args.tts_latency))
+
+        import app
+        from werkzeug.serving import make_server
+        app.VOICE_DIR = tts_utils.VOICE_DIR
+        logging.getLogger().setLevel(logging.WARNING)
+        for name in ("werkzeug", "db_utils", "tts_utils", "guard_utils"):
+            logging.getLogger(name).setLevel(logging.WARNING)
+        app.app.logger.setLevel(logging.CRITICAL)  # 4xx/5xx responses are counted instead
+        app.warm_up()
+
+        server = make_server("127.0.0.1", 0, app.app, threaded=True)
+        threading.Thread(target=server.serve_forever, name="load-test-server", daemon=True).start()
+        try:
+            results = {
+                "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "config": {key: getattr(args, key) for key in
+                           ("requests", "concurrency", "warmup", "seed", "tts_latency", "workers")},
+                "scenarios": {},
+            }
+            print(f"requests: {args.requests}/scenario, concurrency: {args.concurrency}, "
+                  f"eval workers: {args.workers}, fake TTS latency: {args.tts_latency * 1000:.0f} ms")
+            print(f"{'scenario':<10} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+                  f"{'4xx':>6} {'errors':>7}")
+            for scenario in scenarios:
+                if args.warmup:
+                    run_scenario(server.port, scenario, args.warmup, args.concurrency, args.seed - 1)
+                result = run_scenario(server.port, scenario, args.requests, args.concurrency, args.seed)
+                results["scenarios"][scenario] = result
+                print(f"{scenario:<10} {result['throughput']:>9.1f} {result['p50_ms']:>9.2f} "
+                      f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} "
+                      f"{result['client_errors']:>6} {result['errors']:>7}")
+        finally:
+            server.shutdown()
+            db_utils.close_db()
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nsaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.tolerance)
+        if regressions:
+            print(f"regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Caching utilities for Voice Calculator application.
+Provides a bounded, thread-safe LRU cache with TTL expiry and the shared
+expression cache used by the calculation and voice endpoints.
+"""
+import re
+import time
+import logging
+import threading
+from collections import OrderedDict
+
+from calc_utils import clean_expression
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+CACHE_MAX_SIZE = 1024  # Maximum number of cached entries
+CACHE_TTL = 300  # Seconds before a cached entry expires
+
+# Entry kinds stored in the expression cache
+KIND_RESULT = "result"
+KIND_SIMPLIFIED = "simplified"
+KIND_STEPS = "steps"
+KIND_RESULT_ID = "result_id"
+KIND_REJECTED = "rejected"  # Guarded tasks that timed out or ran out of memory
+
+_OPERATOR_SPACING = re.compile(r"\s*([+\-*/%^()])\s*")
+_WHITESPACE = re.compile(r"\s+")
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache with per-entry TTL."""
+
+    def __init__(self, max_size: int = CACHE_MAX_SIZE, ttl: float = CACHE_TTL):
+        """
+        Args:
+            max_size (int): Maximum number of entries to keep
+            ttl (float): Seconds an entry stays valid (None or 0 disables expiry)
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """
+        Get a cached value and mark it as recently used.
+
+        Args:
+            key: Cache key
+            default: Value returned on a miss
+
+        Returns:
+            The cached value, or default if missing or expired
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        """
+        Store a value, evicting the least recently used entries if full.
+
+        Args:
+            key: Cache key
+            value: Value to store
+        """
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        """Remove all entries (counters are kept)."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """
+        Get cache counters.
+
+        Returns:
+            dict: Size, limits, hits, misses, evictions, expirations and hit ratio
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+def normalize_expression(expression: str) -> str:
+    """
+    Normalize an expression so trivially different inputs share a cache key.
+
+    Applies the same character filter as /api/calculate, drops whitespace
+    around operators and parentheses, and writes powers as ^.
+
+    Args:
+        expression (str): Raw or voice-cleaned expression
+
+    Returns:
+        str: Normalized expression
+    """
+    expression = clean_expression(expression).replace("**", "^")
+    expression = _OPERATOR_SPACING.sub(r"\1", expression)
+    return _WHITESPACE.sub(" ", expression).strip()
+
+
+# Shared cache for numeric results, simplified forms and rendered steps
+expression_cache = LRUCache()
@@ -0,0 +1,327 @@
+"""
+Calculation utilities for Voice Calculator application.
+Provides a fast numeric evaluator for plain arithmetic and falls back to SymPy
+for anything it cannot handle. SymPy and NumPy are imported on first use so
+importing this module stays cheap.
+"""
+import ast
+import re
+import math
+import base64
+import operator
+import logging
+from functools import lru_cache
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Names reported for the path that produced a result
+ENGINE_FAST = "fast"
+ENGINE_SYMPY = "sympy"
+
+# Integer powers above this many bits are left to SymPy
+MAX_INT_POW_BITS = 4096
+MAX_FACTORIAL_ARG = 1000
+MAX_VECTOR_POINTS = 1000000  # Maximum number of points in one vectorized evaluation
+
+# Anything that's not a number, operator, decimal point, parentheses or letters
+_INVALID_CHARS = re.compile(r"[^0-9+\-*/%.()\s^a-zA-Z]")
+
+
+class UnsupportedExpression(ValueError):
+    """Raised when the fast evaluator cannot handle an expression."""
+
+
+def clean_expression(expression: str) -> str:
+    """
+    Strip characters that can't be part of a mathematical expression.
+
+    Args:
+        expression (str): Raw expression
+
+    Returns:
+        str: Expression containing only numbers, operators, parentheses and letters
+    """
+    return _INVALID_CHARS.sub("", expression)
+
+
+def _factorial(n):
+    if isinstance(n, float) and n.is_integer():
+        n = int(n)
+    if not isinstance(n, int) or n < 0 or n > MAX_FACTORIAL_ARG:
+        raise UnsupportedExpression("factorial argument out of range")
+    return math.factorial(n)
+
+
+def _pow(base, exp):
+    if isinstance(base, int) and isinstance(exp, int) and exp > 1 and abs(base) > 1:
+        if exp * base.bit_length() > MAX_INT_POW_BITS:
+            raise UnsupportedExpression("integer power too large")
+    result = operator.pow(base, exp)
+    if isinstance(result, complex):
+        raise UnsupportedExpression("complex result")
+    return result
+
+
+# Operators and functions the fast path understands, named as SymPy names them
+BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.Mod: operator.mod,
+    ast.Pow: _pow,
+}
+
+UNARY_OPERATORS = {
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+
+FUNCTIONS = {
+    "sqrt": (math.sqrt, (1,)),
+    "sin": (math.sin, (1,)),
+    "cos": (math.cos, (1,)),
+    "tan": (math.tan, (1,)),
+    "asin": (math.asin, (1,)),
+    "acos": (math.acos, (1,)),
+    "atan": (math.atan, (1,)),
+    "sinh": (math.sinh, (1,)),
+    "cosh": (math.cosh, (1,)),
+    "tanh": (math.tanh, (1,)),
+    "exp": (math.exp, (1,)),
+    "log": (math.log, (1, 2)),
+    "ln": (math.log, (1,)),
+    "abs": (abs, (1,)),
+    "Abs": (abs, (1,)),
+    "floor": (math.floor, (1,)),
+    "ceiling": (math.ceil, (1,)),
+    "factorial": (_factorial, (1,)),
+}
+
+CONSTANTS = {
+    "pi": math.pi,
+    "E": math.e,
+}
+
+
+def _eval_node(node):
+    """Recursively evaluate a whitelisted AST node."""
+    if isinstance(node, ast.Constant):
+        value = node.value
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            raise UnsupportedExpression(f"unsupported literal {value!r}")
+        return value
+
+    if isinstance(node, ast.BinOp):
+        op = BINARY_OPERATORS.get(type(node.op))
+        if op is None:
+            raise UnsupportedExpression(f"unsupported operator {type(node.op).__name__}")
+        return op(_eval_node(node.left), _eval_node(node.right))
+
+    if isinstance(node, ast.UnaryOp):
+        op = UNARY_OPERATORS.get(type(node.op))
+        if op is None:
+            raise UnsupportedExpression(f"unsupported operator {type(node.op).__name__}")
+        return op(_eval_node(node.operand))
+
+    if isinstance(node, ast.Name):
+        if node.id not in CONSTANTS:
+            raise UnsupportedExpression(f"unknown name '{node.id}'")
+        return CONSTANTS[node.id]
+
+    if isinstance(node, ast.Call):
+        if not isinstance(node.func, ast.Name) or node.keywords:
+            raise UnsupportedExpression("unsupported call")
+        func, arities = FUNCTIONS.get(node.func.id, (None, ()))
+        if func is None or len(node.args) not in arities:
+            raise UnsupportedExpression(f"unsupported function '{node.func.id}'")
+        return func(*[_eval_node(arg) for arg in node.args])
+
+    raise UnsupportedExpression(f"unsupported syntax {type(node).__name__}")
+
+
+def fast_evaluate(expression: str) -> float:
+    """
+    Evaluate a plain arithmetic expression with `math`/`float` only.
+
+    Args:
+        expression (str): Cleaned expression, using ^ or ** for powers
+
+    Returns:
+        float: The numeric result
+
+    Raises:
+        UnsupportedExpression: If the expression needs SymPy, or the numeric
+            result would differ from what SymPy produces (domain errors,
+            division by zero, overflow, complex values)
+    """
+    try:
+        tree = ast.parse(expression.replace("^", "**").strip(), mode="eval")
+    except (SyntaxError, ValueError) as e:
+        raise UnsupportedExpression(f"parse error: {e}")
+
+    try:
+        return float(_eval_node(tree.body))
+    except UnsupportedExpression:
+        raise
+    except (ArithmeticError, ValueError, TypeError) as e:
+        raise UnsupportedExpression(f"numeric error: {e}")
+
+
+def evaluate(expression: str) -> tuple:
+    """
+    Evaluate an expression numerically, using SymPy only when required.
+
+    Args:
+        expression (str): Cleaned expression
+
+    Returns:
+        tuple: (result as float, engine name used)
+
+    Raises:
+        SympifyError, ValueError, TypeError: If SymPy cannot evaluate it either
+    """
+    try:
+        return fast_evaluate(expression), ENGINE_FAST
+    except UnsupportedExpression as e:
+        logger.debug(f"Fast path declined '{expression}': {e}")
+
+    return sympy_evaluate(expression), ENGINE_SYMPY
+
+
+def sympy_evaluate(expression: str) -> float:
+    """
+    Evaluate an expression numerically with SymPy.
+
+    Raises:
+        SympifyError, ValueError, TypeError: If it has no real numeric value
+    """
+    from sympy import sympify
+
+    return float(sympify(expression))
+
+
+def format_result(result: float):
+    """
+    Round a numeric result for display.
+
+    Args:
+        result (float): Raw numeric result
+
+    Returns:
+        int | float | str: Integer, rounded float or scientific notation string
+    """
+    if result.is_integer():
+        return int(result)
+    elif abs(result) > 1e10 or (abs(result) < 1e-10 and result != 0):
+        # Use scientific notation for very large/small numbers
+        return f"{result:.10e}"
+    # Limit decimal places
+    return round(result, 10)
+
+
+@lru_cache(maxsize=256)
+def compile_vectorized(expression: str, variables: tuple):
+    """
+    Compile an expression once into a NumPy function of the given variables.
+
+    Args:
+        expression (str): Cleaned expression, e.g. "x^2 + 3"
+        variables (tuple): Variable names, in argument order
+
+    Returns:
+        callable: Vectorized function taking one array per variable
+
+    Raises:
+        ValueError: If the expression uses a variable that isn't bound
+        SympifyError: If the expression can't be parsed
+    """
+    from sympy import sympify, lambdify, Symbol
+
+    symbols = [Symbol(name) for name in variables]
+    expr = sympify(expression, locals={name: symbol for name, symbol in zip(variables, symbols)})
+    unbound = sorted(str(symbol) for symbol in expr.free_symbols - set(symbols))
+    if unbound:
+        raise ValueError(f"Unbound variables: {', '.join(unbound)}")
+    return lambdify(symbols, expr, modules="numpy")
+
+
+def _binding_values(name, spec):
+    """Turn a binding ({"from", "to", "step"} range or list of numbers) into an array."""
+    import numpy as np
+
+    if isinstance(spec, dict):
+        start, stop = float(spec["from"]), float(spec["to"])
+        step = float(spec.get("step", 1))
+        if step == 0 or (stop - start) / step < 0:
+            raise ValueError(f"Invalid range for '{name}'")
+        count = int(math.floor((stop - start) / step + 1e-9)) + 1
+        if count > MAX_VECTOR_POINTS:
+            raise ValueError(f"Too many points for '{name}'")
+        return start + step * np.arange(count)
+    if isinstance(spec, list) and spec:
+        if len(spec) > MAX_VECTOR_POINTS:
+            raise ValueError(f"Too many points for '{name}'")
+        return np.asarray(spec, dtype=float)
+    raise ValueError(f"Invalid binding for '{name}'")
+
+
+def evaluate_vectorized(expression: str, bindings: dict, grid: bool = False,
+                        encoding: str = "list") -> dict:
+    """
+    Evaluate an expression over ranges, lists or a grid of variable values
+    in one NumPy call.
+
+    Args:
+        expression (str): Cleaned expression
+        bindings (dict): Variable name -> {"from", "to", "step"} or list of numbers
+        grid (bool): Evaluate over every combination of values (outer product)
+            instead of element-wise over equally long sequences
+        encoding (str): "list" for JSON numbers (NaN/inf as null) or "base64"
+            for little-endian float64 bytes
+
+    Returns:
+        dict: variables, shape, encoding and values
+
+    Raises:
+        ValueError: For invalid bindings, shapes or sizes
+        SympifyError: If the expression can't be parsed
+    """
+    import numpy as np
+
+    if not isinstance(bindings, dict) or not bindings:
+        raise ValueError("No variables provided")
+    names = tuple(bindings)
+    if not all(isinstance(name, str) and name.isidentifier() for name in names):
+        raise ValueError("Invalid variable name")
+
+    arrays = [_binding_values(name, bindings[name]) for name in names]
+    if grid:
+        if math.prod(len(array) for array in arrays) > MAX_VECTOR_POINTS:
+            raise ValueError("Too many grid points")
+        arrays = np.meshgrid(*arrays, indexing="ij")
+    elif len({len(array) for array in arrays}) > 1:
+        raise ValueError("Variables must have the same number of values unless grid is set")
+
+    func = compile_vectorized(expression, names)
+    with np.errstate(all="ignore"):
+        values = np.asarray(func(*arrays))
+        if np.iscomplexobj(values):
+            values = np.where(np.imag(values) == 0, np.real(values), np.nan)
+        values = np.broadcast_to(values.astype(np.float64), arrays[0].shape)
+
+    if encoding == "base64":
+        payload = base64.b64encode(np.ascontiguousarray(values, dtype="<f8").tobytes()).decode("ascii")
+    elif encoding == "list":
+        payload = np.where(np.isfinite(values), values, None).tolist()
+    else:
+        raise ValueError(f"Unknown encoding '{encoding}'")
+
+    return {
+        "variables": list(names),
+        "shape": list(values.shape),
+        "encoding": encoding,
+        "values": payload,
+    }
@@ -4,9 +4,23 @@ Handles database initialization, queries, and CRUD operations.
 """
 import sqlite3
 import os
+import json
+import re
+import base64
+import queue
+import atexit
 import logging
+import threading
+import time
+import zlib
+import heapq
+from contextlib import contextmanager
 from datetime import datetime
 
+from cache_utils import LRUCache
+from metrics_utils import time_stage, log_hot_path, STAGE_DB
+from events_utils import history_hub, EVENT_HISTORY, EVENT_DELETE, EVENT_CLEAR, REPLAY_LIMIT
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -14,130 +28,1222 @@ logger = logging.getLogger(__name__)
 # Constants
 DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'history', 'history.db')
 MAX_HISTORY_ENTRIES = 50  # Maximum number of history entries to store
+POOL_SIZE = 8  # Maximum number of open connections shared by request threads
+BUSY_TIMEOUT = 5.0  # Seconds to wait on a locked database before failing
+CACHED_STATEMENTS = 128  # Prepared statements kept per connection
+DEFAULT_USER_ID = 'default'  # History owner when no user/session id is given
+WRITE_BEHIND_BATCH_SIZE = 100  # Maximum history inserts per write-behind transaction
+WRITE_BEHIND_INTERVAL = 0.05  # Seconds an insert may wait before it is flushed
+WRITE_BEHIND_MAX_PENDING = 10000  # Callers block once this many inserts are queued
+SETTINGS_CHECK_INTERVAL = 1.0  # Seconds cached settings are trusted before checking for outside writes
+SETTINGS_CACHE_SIZE = 4096  # Settings (and known-missing keys) cached; least recently used are dropped
+LEGACY_PREFERENCES_PATH = os.path.join(os.path.dirname(__file__), '..', 'user_preferences.json')  # Pre-database theme file
+HISTORY_CHECK_INTERVAL = 1.0  # Seconds the in-memory history version is trusted before checking for outside writes
+HISTORY_PAGE_SIZE = 50  # Default number of entries per history page
+HISTORY_MAX_PAGE_SIZE = 200  # Largest page a client may request
+HISTORY_LAST_SLOTS = 1024  # Users whose newest entry is kept in memory
+SEARCH_PAGE_SIZE = 20  # Default number of search results per page
+SEARCH_MAX_PAGE_SIZE = 100  # Largest page of search results a client may request
+SEARCH_MAX_OFFSET = 1000  # Deepest search result a client may page to
+SEARCH_MAX_TERMS = 8  # Search terms used from a query; the rest are ignored
+SEARCH_RANK_WINDOW = 500  # Newest matches ranked by relevance; older ones are not ranked
+SEARCH_BOUNDARY_ROWS = 64  # Rows scanned at each end of a date range for out-of-order ids
+SEARCH_RANK = 'bm25(history_search, 2.0, 1.0, 0.0)'  # Expression matches count twice, user_id not at all
+HISTORY_SHARDS = 1  # History shard files, by hash of the user id; 1 keeps history in DB_PATH itself
+SHARD_POOL_SIZE = 2  # Connections per shard: writes to one file serialize anyway
+SHARD_ID_BITS = 40  # Shard i numbers its rows from i << SHARD_ID_BITS, so a row id names its shard
+RESHARD_BATCH_SIZE = 10000  # Rows copied per transaction when moving history between shard layouts
 
-def get_db_connection():
-    """Create and return a database connection (initializes DB if needed)."""
-    # Ensure the directory exists
-    os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
-    
-    # Connect to database
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row  # Return rows as dictionaries
-    
-    # Initialize database tables if they don't exist
-    _initialize_db(conn)
-    return conn
-
-def _initialize_db(conn):
-    """Initialize the database tables if they don't exist."""
-    cursor = conn.cursor()
-    
-    # Create calculation history table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS calculation_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            expression TEXT NOT NULL,
-            result TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            voice_input BOOLEAN DEFAULT 0
-        )
-    ''')
-    
-    # Create settings table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS settings (
-            key TEXT PRIMARY KEY,
-            value TEXT NOT NULL
+# Schema migrations, applied in order; PRAGMA user_version records how many ran
+SCHEMA_MIGRATIONS = [
+    # 1: per-user key, indexes for history reads, and per-user row counts so
+    #    trimming deletes only the overflow instead of sorting the table
+    '''
+    ALTER TABLE calculation_history ADD COLUMN user_id TEXT NOT NULL DEFAULT 'default';
+    CREATE INDEX IF NOT EXISTS idx_history_timestamp ON calculation_history (timestamp);
+    CREATE INDEX IF NOT EXISTS idx_history_voice ON calculation_history (voice_input, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_history_user ON calculation_history (user_id, id);
+    CREATE TABLE IF NOT EXISTS history_counts (
+        user_id TEXT PRIMARY KEY,
+        row_count INTEGER NOT NULL
+    );
+    INSERT INTO history_counts (user_id, row_count)
+        SELECT user_id, COUNT(*) FROM calculation_history GROUP BY user_id;
+    CREATE TRIGGER IF NOT EXISTS history_count_insert AFTER INSERT ON calculation_history
+    BEGIN
+        INSERT INTO history_counts (user_id, row_count) VALUES (NEW.user_id, 1)
+            ON CONFLICT(user_id) DO UPDATE SET row_count = row_count + 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS history_count_delete AFTER DELETE ON calculation_history
+    BEGIN
+        UPDATE history_counts SET row_count = row_count - 1 WHERE user_id = OLD.user_id;
+    END;
+    ''',
+    # 2: settings version counter, bumped by every write to the settings table
+    #    (from any process) so cached settings know when to reload
+    '''
+    CREATE TABLE IF NOT EXISTS settings_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO settings_version (id, version) VALUES (1, 0);
+    CREATE TRIGGER IF NOT EXISTS settings_version_insert AFTER INSERT ON settings
+    BEGIN
+        UPDATE settings_version SET version = version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS settings_version_update AFTER UPDATE ON settings
+    BEGIN
+        UPDATE settings_version SET version = version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS settings_version_delete AFTER DELETE ON settings
+    BEGIN
+        UPDATE settings_version SET version = version + 1 WHERE id = 1;
+    END;
+    ''',
+    # 3: history version counter, bumped by every insert and delete (from any
+    #    process) for conditional GETs, and an index for per-user pagination
+    #    on (timestamp, id)
+    '''
+    CREATE TABLE IF NOT EXISTS history_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO history_version (id, version) VALUES (1, 0);
+    CREATE TRIGGER IF NOT EXISTS history_version_insert AFTER INSERT ON calculation_history
+    BEGIN
+        UPDATE history_version SET version = version + 1 WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS history_version_delete AFTER DELETE ON calculation_history
+    BEGIN
+        UPDATE history_version SET version = version + 1 WHERE id = 1;
+    END;
+    CREATE INDEX IF NOT EXISTS idx_history_user_timestamp ON calculation_history (user_id, timestamp);
+    ''',
+    # 4: full-text index over expression and result text, kept in sync by
+    #    triggers. Decimal points stay inside tokens so "0.045" is one term;
+    #    prefix indexes keep common short prefixes ("sq", "sqrt") from merging
+    #    thousands of terms. user_id is indexed too, so per-user searches
+    #    intersect inside FTS5.
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS history_search USING fts5(
+        expression, result, user_id,
+        content='calculation_history', content_rowid='id',
+        tokenize="unicode61 tokenchars '.'", prefix='2 3 4'
+    );
+    CREATE TRIGGER IF NOT EXISTS history_search_insert AFTER INSERT ON calculation_history
+    BEGIN
+        INSERT INTO history_search (rowid, expression, result, user_id)
+            VALUES (NEW.id, NEW.expression, NEW.result, NEW.user_id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS history_search_delete AFTER DELETE ON calculation_history
+    BEGIN
+        INSERT INTO history_search (history_search, rowid, expression, result, user_id)
+            VALUES ('delete', OLD.id, OLD.expression, OLD.result, OLD.user_id);
+    END;
+    CREATE TRIGGER IF NOT EXISTS history_search_update AFTER UPDATE OF expression, result, user_id
+        ON calculation_history
+    BEGIN
+        INSERT INTO history_search (history_search, rowid, expression, result, user_id)
+            VALUES ('delete', OLD.id, OLD.expression, OLD.result, OLD.user_id);
+        INSERT INTO history_search (rowid, expression, result, user_id)
+            VALUES (NEW.id, NEW.expression, NEW.result, NEW.user_id);
+    END;
+    INSERT INTO history_search (history_search) VALUES ('rebuild');
+    ''',
+]
+
+class ConnectionPool:
+    """
+    Thread-safe pool of SQLite connections to a single database file.
+    Connections are opened lazily, configured for WAL mode and reused across
+    requests instead of being opened and closed per query.
+    """
+
+    def __init__(self, db_path, size=POOL_SIZE):
+        self.db_path = db_path
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+
+    def _connect(self):
+        """Open and configure a new connection."""
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=BUSY_TIMEOUT,
+            check_same_thread=False,  # Guarded by the pool: one thread at a time
+            cached_statements=CACHED_STATEMENTS,
         )
-    ''')
-    
-    conn.commit()
-    logger.debug("Database tables ensured.")
+        conn.row_factory = sqlite3.Row  # Return rows as dictionaries
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')  # Durable in WAL mode, fsyncs only at checkpoints
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
 
-def add_calculation(expression, result, voice_input=False):
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a with-block.
+        Uncommitted changes are rolled back if the block raises.
+        """
+        with time_stage(STAGE_DB):  # Includes waiting for a free connection
+            self._slots.acquire()
+            try:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._connect()
+                    with self._lock:
+                        self._created += 1
+                with self._lock:
+                    self._in_use += 1
+                try:
+                    yield conn
+                except BaseException:
+                    conn.rollback()
+                    raise
+                finally:
+                    with self._lock:
+                        self._in_use -= 1
+                    self._idle.put(conn)
+            finally:
+                self._slots.release()
+
+    def stats(self):
+        """Return pool usage counters."""
+        with self._lock:
+            return {
+                'size': self.size,
+                'created': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+            }
+
+    def close(self):
+        """Close all idle connections."""
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
     """
-    Add a calculation to history.
+    Return the connection pool for DB_PATH, creating it and the schema on first use.
+    """
+    global _pool
+    pool = _pool
+    if pool is not None and pool.db_path == DB_PATH:
+        return pool
 
-    Args:
-        expression (str): The calculation expression
-        result (str): The calculation result
-        voice_input (bool): Whether the calculation was from voice input
+    with _pool_lock:
+        if _pool is None or _pool.db_path != DB_PATH:
+            if _pool is not None:
+                _pool.close()
+            # Ensure the directory exists
+            os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
+            pool = ConnectionPool(DB_PATH)
+            with pool.connection() as conn:
+                _initialize_db(conn)
+                _import_legacy_preferences(conn)
+            _pool = pool
+        return _pool
+
+def get_db_connection():
+    """
+    Borrow a pooled database connection (initializes DB if needed).
+
+    Use as a context manager: ``with get_db_connection() as conn: ...``
+    """
+    return get_pool().connection()
+
+def get_pool_stats():
+    """
+    Get connection pool usage without opening the database.
 
     Returns:
-        int: ID of the newly inserted record
+        dict: Pool counters plus queued write-behind entries and, when history
+            is sharded, the counters of each shard's pool; None before first use
+    """
+    pool = _pool
+    if pool is None:
+        return None
+    stats = pool.stats()
+    writer = _writer
+    stats['write_behind_pending'] = len(writer.pending()) if writer is not None else 0
+    shards = _shards
+    if shards is not None:
+        stats['shards'] = [shard.stats() for shard in shards[1]]
+    return stats
+
+def close_db():
+    """Close all pooled connections (e.g. on shutdown or when switching DB_PATH)."""
+    global _pool, _shards
+    stop_write_behind()
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+        if _shards is not None:
+            for pool in _shards[1]:
+                pool.close()
+            _shards = None
+    settings_cache.clear()
+
+def _initialize_db(conn, first_id=None):
     """
-    conn = None
+    Initialize the database tables if they don't exist and apply pending
+    migrations, in one write transaction.
+
+    Args:
+        conn: Connection to initialize
+        first_id (int): Row id to number history after in a new database (history shards)
+    """
+    if conn.execute('PRAGMA user_version').fetchone()[0] == len(SCHEMA_MIGRATIONS):
+        return  # Up to date; no need to wait for the write lock
+
+    # BEGIN IMMEDIATE takes the write lock up front (waiting up to BUSY_TIMEOUT),
+    # so processes starting together set up the schema one after another
+    conn.execute('BEGIN IMMEDIATE')
     try:
-        conn = get_db_connection()
         cursor = conn.cursor()
         
+        # Create calculation history table
         cursor.execute('''
-            INSERT INTO calculation_history (expression, result, timestamp, voice_input)
-            VALUES (?, ?, ?, ?)
-        ''', (expression, result, datetime.now().isoformat(), int(voice_input)))
+            CREATE TABLE IF NOT EXISTS calculation_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                expression TEXT NOT NULL,
+                result TEXT NOT NULL,
+                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+                voice_input BOOLEAN DEFAULT 0
+            )
+        ''')
         
-        record_id = cursor.lastrowid
+        # Create settings table
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS settings (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL
+            )
+        ''')
         
-        # Enforce history limit
+        _migrate_db(conn)
+        if first_id is not None:
+            # Start the shard's ids at its own range (a no-op once it has rows)
+            cursor.execute('''
+                INSERT INTO sqlite_sequence (name, seq)
+                SELECT 'calculation_history', ?
+                WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'calculation_history')
+            ''', (first_id,))
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    logger.debug("Database tables ensured.")
+
+def _import_legacy_preferences(conn):
+    """
+    Copy preferences saved in user_preferences.json (before settings moved
+    into the database) to the default user. Keys already in the settings
+    table win, so running this again changes nothing.
+    """
+    if not os.path.exists(LEGACY_PREFERENCES_PATH):
+        return
+    try:
+        with open(LEGACY_PREFERENCES_PATH) as f:
+            preferences = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read {LEGACY_PREFERENCES_PATH}: {e}")
+        return
+    if not isinstance(preferences, dict):
+        return
+    rows = [(_preference_key(DEFAULT_USER_ID, name), value) for name, value in preferences.items()
+            if isinstance(value, str)]
+    cursor = conn.executemany('INSERT OR IGNORE INTO settings (key, value) VALUES (?, ?)', rows)
+    conn.commit()
+    if cursor.rowcount > 0:
+        logger.info(f"Imported {cursor.rowcount} preferences from {LEGACY_PREFERENCES_PATH}")
+
+def _script_statements(script):
+    """Split an SQL script into statements; trigger bodies keep their inner semicolons."""
+    statements = []
+    statement = ''
+    for part in script.split(';'):
+        statement += part + ';'
+        if sqlite3.complete_statement(statement):
+            if statement.strip(' \n;'):
+                statements.append(statement)
+            statement = ''
+    return statements
+
+def _migrate_db(conn):
+    """
+    Apply any schema migrations the database hasn't seen yet. Runs inside
+    the caller's write transaction, so user_version read here cannot change
+    before the migrations commit. (executescript() would commit first.)
+    """
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, script in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        for statement in _script_statements(script):
+            conn.execute(statement)
+        conn.execute(f'PRAGMA user_version = {number}')
+        logger.info(f"Applied database migration {number}")
+
+_shards = None  # ((DB_PATH, HISTORY_SHARDS), shard pools) while history is sharded
+
+def configure_history_shards(shards):
+    """
+    Set how many shard files history is spread over; 1 keeps it in DB_PATH.
+    Takes effect on the next history access. Existing history is moved to
+    a new layout with reshard_history() (see migrate_shards.py).
+
+    Args:
+        shards (int): Number of shard files
+    """
+    global HISTORY_SHARDS
+    if shards < 1:
+        raise ValueError("History needs at least one shard")
+    HISTORY_SHARDS = shards
+
+def shard_index(user_id, shards=None):
+    """
+    Return the shard holding a user's history. The hash is stable across
+    processes and restarts, unlike hash().
+
+    Args:
+        user_id (str): History owner
+        shards (int, optional): Shard count (default HISTORY_SHARDS)
+    """
+    return zlib.crc32(str(user_id).encode('utf-8')) % (shards or HISTORY_SHARDS)
+
+def shard_path(index, shards=None):
+    """
+    Return the file of one history shard, in a shards/ directory next to
+    DB_PATH. The shard count is part of the name, so files of another
+    layout are never read by mistake.
+    """
+    shards = shards or HISTORY_SHARDS
+    return os.path.join(os.path.dirname(DB_PATH), 'shards', f'history-{index}-of-{shards}.db')
+
+def _open_shards(shards):
+    """Open the pools of a shard layout, creating the files and schema as needed."""
+    if shards == 1:
+        return [get_pool()]
+    pools = []
+    for index in range(shards):
+        path = shard_path(index, shards)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        pool = ConnectionPool(path, SHARD_POOL_SIZE)
+        with pool.connection() as conn:
+            _initialize_db(conn, first_id=index << SHARD_ID_BITS)
+        pools.append(pool)
+    return pools
+
+def _history_pools():
+    """Return the connection pools of all history shards, in shard order."""
+    global _shards
+    if HISTORY_SHARDS == 1:
+        return [get_pool()]
+    key = (DB_PATH, HISTORY_SHARDS)
+    shards = _shards
+    if shards is not None and shards[0] == key:
+        return shards[1]
+
+    get_pool()  # Settings stay in DB_PATH
+    with _pool_lock:
+        if _shards is None or _shards[0] != key:
+            if _shards is not None:
+                for pool in _shards[1]:
+                    pool.close()
+            _shards = (key, _open_shards(HISTORY_SHARDS))
+            logger.info(f"History sharded over {HISTORY_SHARDS} files")
+        return _shards[1]
+
+def _history_pool(user_id):
+    """Return the pool of the shard holding a user's history."""
+    pools = _history_pools()
+    return pools[shard_index(user_id, len(pools))] if len(pools) > 1 else pools[0]
+
+def _record_pool(record_id):
+    """Return the pool of the shard a row id belongs to, or None if no shard has it."""
+    pools = _history_pools()
+    index = record_id >> SHARD_ID_BITS
+    return pools[index] if 0 <= index < len(pools) else None
+
+def _group_by_shard(entries):
+    """Split entries by the shard that stores them, keeping their order."""
+    pools = _history_pools()
+    if len(pools) == 1:
+        return [(pools[0], entries)]
+    groups = {}
+    for entry in entries:
+        groups.setdefault(shard_index(entry['user_id'], len(pools)), []).append(entry)
+    return [(pools[index], group) for index, group in groups.items()]
+
+def _query_history(sql, params=(), user_id=None):
+    """
+    Run a read on the shard holding user_id's history, or on every shard
+    when user_id is None. Returns the rows of all shards as dicts, in shard
+    order; callers merge them.
+    """
+    pools = [_history_pool(user_id)] if user_id is not None else _history_pools()
+    records = []
+    for pool in pools:
+        with pool.connection() as conn:
+            records.extend(dict(row) for row in conn.execute(sql, params))
+    return records
+
+def _history_version():
+    """Return the sum of the shards' history version counters; it grows on every change."""
+    version = 0
+    for pool in _history_pools():
+        with pool.connection() as conn:
+            version += conn.execute('SELECT version FROM history_version WHERE id = 1').fetchone()[0]
+    return version
+
+def _insert_entries(cursor, entries):
+    """
+    Insert history entries and trim each affected user's history.
+    Sets the 'id' of every entry to its new row id.
+
+    Returns:
+        int: Rows inserted and deleted, which is how far the shard's history
+            version counter moved
+    """
+    changes = len(entries)
+    for entry in entries:
+        cursor.execute('''
+            INSERT INTO calculation_history (expression, result, timestamp, voice_input, user_id)
+            VALUES (?, ?, ?, ?, ?)
+        ''', (entry['expression'], entry['result'], entry['timestamp'], entry['voice_input'], entry['user_id']))
+        entry['id'] = cursor.lastrowid
+
+    # Enforce history limit: drop only each user's overflow (normally one row
+    # per insert), oldest first, via the (user_id, id) index
+    for user_id in {entry['user_id'] for entry in entries}:
         cursor.execute('''
             DELETE FROM calculation_history
             WHERE id IN (
                 SELECT id FROM calculation_history
-                ORDER BY timestamp DESC
-                LIMIT -1 OFFSET ?
+                WHERE user_id = ?
+                ORDER BY id
+                LIMIT max(0, (SELECT row_count FROM history_counts WHERE user_id = ?) - ?)
             )
-        ''', (MAX_HISTORY_ENTRIES,))
-        
-        conn.commit()
-        logger.info(f"Added calculation to history: {expression} = {result}")
-        return record_id
+        ''', (user_id, user_id, MAX_HISTORY_ENTRIES))
+        changes += cursor.rowcount
+    return changes
+
+def _publish_entries(entries):
+    """Push committed entries to open history streams."""
+    for entry in entries:
+        history_hub.publish(EVENT_HISTORY, dict(entry), entry['id'], entry['user_id'])
+
+class HistoryWriter:
+    """
+    Write-behind queue for history inserts.
+    Entries are queued in memory and a background thread commits them in
+    batches, one transaction per batch and shard. Queued entries stay
+    visible to history reads until they are committed.
+    """
+
+    def __init__(self, batch_size=WRITE_BEHIND_BATCH_SIZE, flush_interval=WRITE_BEHIND_INTERVAL,
+                 max_pending=WRITE_BEHIND_MAX_PENDING):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._cond = threading.Condition()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='history-writer', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def submit(self, entry):
+        """
+        Queue an entry, blocking while the queue is full.
+
+        Returns:
+            bool: False if the writer is shutting down and the caller must write it
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._stopping or len(self._pending) < self.max_pending)
+            if self._stopping:
+                return False
+            self._pending.append(entry)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+            return True
+
+    def queued(self):
+        """Return the number of entries not yet committed."""
+        with self._cond:
+            return len(self._pending)
+
+    def pending(self):
+        """Return a snapshot of the entries not yet committed, oldest first."""
+        with self._cond:
+            return list(self._pending)
+
+    def flush(self):
+        """Block until everything queued so far has been committed."""
+        with self._cond:
+            self._cond.notify_all()
+            self._cond.wait_for(lambda: not self._pending or not self._thread.is_alive())
+
+    def stop(self):
+        """Drain the queue and stop the background thread."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._stopping or len(self._pending) >= self.batch_size,
+                                    timeout=self.flush_interval)
+                batch = self._pending[:self.batch_size]
+                if not batch:
+                    if self._stopping:
+                        self._cond.notify_all()
+                        return
+                    continue
+
+            retry, error = [], None
+            for pool, entries in _group_by_shard(batch):
+                try:
+                    with pool.connection() as conn:
+                        changes = _insert_entries(conn.cursor(), entries)
+                        conn.commit()
+                    history_state.committed(changes)  # Before the entries leave the queue
+                    _publish_entries(entries)
+                except sqlite3.Error as e:
+                    for entry in entries:
+                        entry['id'] = None
+                    retry.extend(entries)
+                    error = e
+            if retry and self._stopping:
+                logger.error(f"Dropping {len(retry)} queued history entries on shutdown: {error}")
+                retry = []
+            elif retry:
+                logger.error(f"Error flushing {len(retry)} history entries, will retry: {error}")
+
+            with self._cond:
+                # Only this thread removes entries, always from the front; the
+                # entries of shards that failed stay queued
+                self._pending[:len(batch)] = retry
+                self._cond.notify_all()
+            if retry:
+                time.sleep(self.flush_interval)
+                continue
+            logger.debug(f"Flushed {len(batch)} history entries")
+
+_writer = None
+
+def start_write_behind(batch_size=WRITE_BEHIND_BATCH_SIZE, flush_interval=WRITE_BEHIND_INTERVAL):
+    """
+    Switch add_calculation to write-behind mode.
+    The queue is drained by stop_write_behind(), which also runs at exit.
+    """
+    global _writer
+    if _writer is None:
+        _history_pools()
+        _writer = HistoryWriter(batch_size, flush_interval)
+        _writer.start()
+        atexit.register(stop_write_behind)
+        logger.info("History write-behind enabled.")
+
+def stop_write_behind():
+    """Commit all queued history entries and return to synchronous writes."""
+    global _writer
+    writer, _writer = _writer, None
+    if writer is not None:
+        writer.stop()
+        logger.info("History write-behind stopped.")
+
+class HistoryState:
+    """
+    In-memory view of the history table for requests that need no rows: a
+    version tag for conditional GETs and the newest entry per user.
+    Writes made by this process update it directly; writes from other
+    processes are noticed through the history version counters of the
+    shards, checked at most every check_interval seconds.
+    """
+
+    def __init__(self, check_interval=HISTORY_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._token = os.urandom(4).hex()  # Tells this process's queued writes from other processes'
+        self._layout = None  # (DB_PATH, HISTORY_SHARDS) the version belongs to
+        self._db_version = None
+        self._local = 0  # Bumped on every change seen by this process
+        self._checked_at = 0.0
+        self._last = {}  # user_id (None = any user) -> newest entry, or None if empty
+        self._lock = threading.Lock()
+
+    def _reset(self, version):
+        """Forget the newest entries. Caller holds the lock."""
+        self._layout = (DB_PATH, HISTORY_SHARDS)
+        self._db_version = version
+        self._local += 1
+        self._last.clear()
+
+    def _moved(self, changes):
+        """Add this process's committed changes to the known version. Caller holds the lock."""
+        if self._db_version is not None:
+            self._db_version += changes
+
+    def _validate(self):
+        """Reset when another process changed history or DB_PATH or the shards changed."""
+        now = time.monotonic()
+        layout = (DB_PATH, HISTORY_SHARDS)
+        with self._lock:
+            if self._layout == layout and now - self._checked_at < self.check_interval:
+                return
+            local = self._local
+        version = _history_version()
+        with self._lock:
+            if local != self._local and self._layout == layout:
+                return  # A write of this process raced the read; check again next time
+            if version != self._db_version or self._layout != layout:
+                self._reset(version)
+            self._checked_at = now
+
+    def etag(self):
+        """
+        Return a tag that changes whenever history may have changed. It is
+        the shards' shared version, so every process serving the same
+        database gives the same tag, plus a part of this process's own
+        while it has write-behind entries that only its reads include.
+        """
+        writer = _writer
+        queued = writer is not None and writer.queued()  # Checked first: a flush moves the version before it dequeues
+        self._validate()
+        with self._lock:
+            tag = f"{HISTORY_SHARDS}-{self._db_version}"
+            return f"{tag}-{self._token}-{self._local}" if queued else tag
+
+    def recorded(self, entries, changes=0):
+        """
+        Note entries just inserted or queued, oldest first.
+
+        Args:
+            entries (list): The entries
+            changes (int): Rows committed (inserted and trimmed); 0 if queued
+        """
+        with self._lock:
+            self._local += 1
+            self._moved(changes)
+            if len(self._last) >= HISTORY_LAST_SLOTS:
+                self._last.clear()
+            for entry in entries:
+                self._last[entry['user_id']] = dict(entry)
+            self._last[None] = dict(entries[-1])
+
+    def committed(self, changes):
+        """Note queued entries the write-behind thread just committed."""
+        with self._lock:
+            self._moved(changes)
+
+    def changed(self, changes):
+        """Note deleted entries; the newest entries are reloaded on demand."""
+        with self._lock:
+            self._local += 1
+            self._moved(changes)
+            self._last.clear()
+
+    def last(self, user_id=None):
+        """Return the newest entry (of one user), reading the database only on a miss."""
+        self._validate()
+        with self._lock:
+            if user_id in self._last:
+                entry = self._last[user_id]
+                return dict(entry) if entry is not None else None
+            local = self._local
+
+        records, _ = get_history_page(1, user_id=user_id)
+        entry = records[0] if records else None
+        with self._lock:
+            if local == self._local:
+                self._last[user_id] = entry
+        return dict(entry) if entry is not None else None
+
+history_state = HistoryState()
+
+def _merge_pending(pending, rows, limit=None, user_id=None, voice_only=False):
+    """
+    Merge queued write-behind entries into rows read from the database.
+    Callers must read the pending snapshot before querying, so an entry
+    committed in between is recognised by its id and not listed twice.
+    """
+    seen = {row['id'] for row in rows}
+    extra = [
+        dict(entry) for entry in reversed(pending)
+        if entry['id'] not in seen
+        and (user_id is None or entry['user_id'] == user_id)
+        and (not voice_only or entry['voice_input'])
+    ]
+    if not extra:
+        return rows
+    merged = sorted(extra + rows, key=lambda row: row['timestamp'], reverse=True)
+    return merged[:limit] if limit else merged
+
+def add_calculation(expression, result, voice_input=False, user_id=DEFAULT_USER_ID):
+    """
+    Add a calculation to history.
+
+    Args:
+        expression (str): The calculation expression
+        result (str): The calculation result
+        voice_input (bool): Whether the calculation was from voice input
+        user_id (str): Owner of the entry; history is trimmed per user
+
+    Returns:
+        int: ID of the newly inserted record (None in write-behind mode)
+    """
+    entry = {
+        'id': None,
+        'expression': expression,
+        'result': result,
+        'timestamp': datetime.now().isoformat(),
+        'voice_input': int(voice_input),
+        'user_id': user_id,
+    }
+
+    writer = _writer
+    if writer is not None and writer.submit(entry):
+        history_state.recorded([entry])
+        log_hot_path(logger, "Queued calculation for history: %s = %s", expression, result)
+        return None
+
+    try:
+        with _history_pool(user_id).connection() as conn:
+            changes = _insert_entries(conn.cursor(), [entry])
+            conn.commit()
+        history_state.recorded([entry], changes)
+        _publish_entries([entry])
+        log_hot_path(logger, "Added calculation to history: %s = %s", expression, result)
+        return entry['id']
 
     except sqlite3.Error as e:
         logger.error(f"Error adding calculation: {e}")
-        if conn:
-            conn.rollback()
         raise
-    finally:
-        if conn:
-            conn.close()
 
-def get_calculation_history(limit=None):
+def add_calculations(calculations, voice_input=False, user_id=DEFAULT_USER_ID):
+    """
+    Add several calculations to history in one transaction (one user's
+    entries are all in one shard).
+
+    Args:
+        calculations (list): (expression, result) pairs, oldest first
+        voice_input (bool): Whether the calculations were from voice input
+        user_id (str): Owner of the entries
+
+    Returns:
+        list: IDs of the new records (None for each entry in write-behind mode)
+    """
+    entries = [{
+        'id': None,
+        'expression': expression,
+        'result': result,
+        'timestamp': datetime.now().isoformat(),
+        'voice_input': int(voice_input),
+        'user_id': user_id,
+    } for expression, result in calculations]
+    if not entries:
+        return []
+
+    remaining = entries
+    writer = _writer
+    if writer is not None:
+        remaining = [entry for entry in entries if not writer.submit(entry)]
+        if not remaining:
+            history_state.recorded(entries)
+            log_hot_path(logger, "Queued %d calculations for history", len(entries))
+            return [None] * len(entries)
+
+    try:
+        with _history_pool(user_id).connection() as conn:
+            changes = _insert_entries(conn.cursor(), remaining)
+            conn.commit()
+        history_state.recorded(entries, changes)
+        _publish_entries(remaining)
+        log_hot_path(logger, "Added %d calculations to history", len(entries))
+        return [entry['id'] for entry in entries]
+
+    except sqlite3.Error as e:
+        logger.error(f"Error adding calculations: {e}")
+        raise
+
+def get_calculation_history(limit=None, user_id=None):
     """
     Get calculation history.
 
     Args:
         limit (int, optional): Maximum number of records to return
+        user_id (str, optional): Only return this user's records
 
     Returns:
         list: List of calculation history records
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        if limit:
-            cursor.execute('''
+        pending = _writer.pending() if _writer is not None else []
+        if user_id is not None:
+            results = _query_history('''
                 SELECT * FROM calculation_history 
-                ORDER BY timestamp DESC 
+                WHERE user_id = ?
+                ORDER BY id DESC 
                 LIMIT ?
-            ''', (limit,))
+            ''', (user_id, limit or -1), user_id)
         else:
-            cursor.execute('''
+            results = _query_history('''
                 SELECT * FROM calculation_history 
-                ORDER BY timestamp DESC
-            ''')
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        logger.info(f"Retrieved {len(results)} history records")
+                ORDER BY timestamp DESC 
+                LIMIT ?
+            ''', (limit or -1,))
+            results.sort(key=lambda row: row['timestamp'], reverse=True)  # Merge the shards
+            results = results[:limit] if limit else results
+        if pending:
+            results = _merge_pending(pending, results, limit, user_id)
+        log_hot_path(logger, "Retrieved %d history records", len(results))
         return results
 
     except sqlite3.Error as e:
         logger.error(f"Error retrieving history: {e}")
         raise
-    finally:
-        if conn:
-            conn.close()
+
+def _encode_cursor(record):
+    raw = json.dumps([record['timestamp'], record['id']]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+def _decode_cursor(cursor):
+    """Return the (timestamp, id) a cursor points at; ValueError if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        timestamp, record_id = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid history cursor: {cursor}") from e
+    if not isinstance(timestamp, str) or not isinstance(record_id, int):
+        raise ValueError(f"Invalid history cursor: {cursor}")
+    return timestamp, record_id
+
+def get_history_page(limit=HISTORY_PAGE_SIZE, cursor=None, user_id=None):
+    """
+    Get one page of history, newest first, using keyset pagination on
+    (timestamp, id): each page is an index range scan, however deep, on
+    each shard.
+
+    Args:
+        limit (int): Maximum number of records to return
+        cursor (str, optional): next_cursor of the previous page
+        user_id (str, optional): Only return this user's records
+
+    Returns:
+        tuple: (list of records, cursor for the next page or None)
+    """
+    before = _decode_cursor(cursor) if cursor else None
+    conditions, params = [], []
+    if user_id is not None:
+        conditions.append('user_id = ?')
+        params.append(user_id)
+    if before is not None:
+        conditions.append('(timestamp, id) < (?, ?)')
+        params.extend(before)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+
+    try:
+        for attempt in range(2):
+            pending = _writer.pending() if _writer is not None else []
+            records = _query_history(f'''
+                SELECT * FROM calculation_history
+                {where}
+                ORDER BY timestamp DESC, id DESC
+                LIMIT ?
+            ''', params + [limit + 1], user_id)
+            if user_id is None:
+                # Every shard returned its own page; keep the newest across them
+                records = heapq.nlargest(limit + 1, records, key=lambda row: (row['timestamp'], row['id']))
+
+            if pending:
+                seen = {row['id'] for row in records}
+                extra = [
+                    dict(entry) for entry in pending
+                    if entry['id'] not in seen
+                    and (user_id is None or entry['user_id'] == user_id)
+                    and (before is None or entry['timestamp'] < before[0])
+                ]
+                records = sorted(extra + records, reverse=True, key=lambda row: (
+                    row['timestamp'], row['id'] if row['id'] is not None else float('inf')))
+
+            more = len(records) > limit
+            records = records[:limit]
+            # A cursor needs a committed row id; queued entries are committed first
+            if more and records[-1]['id'] is None and _writer is not None and attempt == 0:
+                _writer.flush()
+                continue
+            break
+
+        next_cursor = _encode_cursor(records[-1]) if more and records[-1]['id'] is not None else None
+        log_hot_path(logger, "Retrieved %d history records", len(records))
+        return records, next_cursor
+
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving history page: {e}")
+        raise
+
+def get_history_since(last_id, user_id=None, limit=REPLAY_LIMIT):
+    """
+    Get entries committed after a given row id, for resuming a history stream.
+    With several shards, entries of other shards than last_id's are those
+    newer than the entry last_id names.
+
+    Args:
+        last_id (int): Last-Event-ID the client saw
+        user_id (str, optional): Only return this user's records
+        limit (int): Maximum number of records; the newest are kept
+
+    Returns:
+        list: Records, oldest first
+    """
+    try:
+        if user_id is not None:
+            records = _query_history('''
+                SELECT * FROM calculation_history
+                WHERE user_id = ? AND id > ?
+                ORDER BY id DESC
+                LIMIT ?
+            ''', (user_id, last_id, limit), user_id)
+            return records[::-1]
+
+        pools = _history_pools()
+        origin = _record_pool(last_id)
+        after = None
+        if len(pools) > 1 and origin is not None:
+            # Ids only order rows within a shard: the other shards resume
+            # after the timestamp of the newest row up to last_id
+            with origin.connection() as conn:
+                row = conn.execute('''
+                    SELECT timestamp FROM calculation_history WHERE id <= ? ORDER BY id DESC LIMIT 1
+                ''', (last_id,)).fetchone()
+            after = row['timestamp'] if row else None
+
+        records = []
+        for pool in pools:
+            with pool.connection() as conn:
+                if pool is origin or len(pools) == 1:
+                    rows = conn.execute('''
+                        SELECT * FROM calculation_history
+                        WHERE id > ?
+                        ORDER BY id DESC
+                        LIMIT ?
+                    ''', (last_id, limit)).fetchall()
+                else:
+                    rows = conn.execute('''
+                        SELECT * FROM calculation_history
+                        WHERE timestamp > ?
+                        ORDER BY timestamp DESC
+                        LIMIT ?
+                    ''', (after or '', limit)).fetchall()
+            records.extend(dict(row) for row in rows)
+        if len(pools) > 1:
+            records = heapq.nlargest(limit, records, key=lambda row: (row['timestamp'], row['id']))
+        return records[::-1]
+
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving history since {last_id}: {e}")
+        raise
+
+_SEARCH_TERM = re.compile(r"[^\W_]+(?:\.[^\W_]+)*")  # Words and decimals, as the index tokenizes them
+
+def _search_query(text, user_id=None):
+    """
+    Turn free text into an FTS5 query: every term must match the expression
+    or result, as a prefix. Operators and FTS5 syntax in the input are
+    treated as separators.
+    """
+    terms = _SEARCH_TERM.findall(text.lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        raise ValueError("Search query has no searchable terms")
+    match = ' '.join(f'"{term}"*' for term in terms)
+    # Only the id's word tokens go into the query; an id without any (e.g.
+    # '"') is left to the exact user_id check of the caller
+    user_terms = ' '.join(_SEARCH_TERM.findall(user_id.lower())) if user_id is not None else ''
+    if not user_terms:
+        return f"{{expression result}} : ({match})"
+    return f'{{expression result}} : ({match}) AND user_id : "{user_terms}"'
+
+def _id_range(conn, since, until):
+    """
+    Translate a timestamp range into a row id range the FTS5 scan can use.
+    Ids follow timestamps, except for a few rows committed out of order by
+    concurrent writers, so both ends look SEARCH_BOUNDARY_ROWS rows past the
+    boundary.
+
+    Returns:
+        tuple: (lowest id, highest id), either None if unbounded, or None if no rows are in range
+    """
+    low = high = None
+    if since:
+        low = conn.execute('''
+            SELECT min(id) FROM (
+                SELECT id FROM calculation_history WHERE timestamp >= ? ORDER BY timestamp LIMIT ?
+            )
+        ''', (since, SEARCH_BOUNDARY_ROWS)).fetchone()[0]
+        if low is None:
+            return None
+    if until:
+        high = conn.execute('''
+            SELECT max(id) FROM (
+                SELECT id FROM calculation_history WHERE timestamp < ? ORDER BY timestamp DESC LIMIT ?
+            )
+        ''', (until, SEARCH_BOUNDARY_ROWS)).fetchone()[0]
+        if high is None:
+            return None
+    return low, high
+
+def search_history(query, limit=SEARCH_PAGE_SIZE, offset=0, user_id=None, since=None, until=None,
+                   order='rank'):
+    """
+    Full-text search over history expressions and results.
+    Ranked searches order the newest SEARCH_RANK_WINDOW matches by relevance,
+    so broad terms cost the same on a small or a very large history; pages
+    past the window are only available newest first (order='recent').
+
+    A search without user_id runs on every shard. Each shard has its own
+    FTS5 index and term statistics, so bm25 scores of different shards
+    are not comparable: ranked results are merged by their position in
+    their shard's ranking (each shard's best match, then each second best,
+    newest first among equals), and 'rank' is only meaningful within a shard.
+
+    Args:
+        query (str): Free text; each term matches words starting with it
+        limit (int): Maximum number of records to return
+        offset (int): Number of matching records to skip
+        user_id (str, optional): Only search this user's records
+        since (str, optional): ISO timestamp; only records at or after it
+        until (str, optional): ISO timestamp; only records before it
+        order (str): 'rank' for best matches first, 'recent' for newest first
+
+    Returns:
+        tuple: (list of records with their 'rank', offset of the next page or None)
+
+    Raises:
+        ValueError: If the query has no searchable terms, or a ranked search
+            asks for an offset at or past SEARCH_RANK_WINDOW
+    """
+    max_offset = SEARCH_RANK_WINDOW if order == 'rank' else SEARCH_MAX_OFFSET
+    if order == 'rank' and offset >= SEARCH_RANK_WINDOW:
+        raise ValueError(f"Ranked search results end at {SEARCH_RANK_WINDOW}; page further with order='recent'")
+    conditions, params = ['history_search MATCH ?'], [_search_query(query, user_id)]
+    if user_id is not None:
+        conditions.append('f.user_id = ?')  # Exact check; the FTS5 user_id match is by tokens
+        params.append(user_id)
+    if since:
+        conditions.append('f.timestamp >= ?')
+        params.append(since)
+    if until:
+        conditions.append('f.timestamp < ?')
+        params.append(until)
+
+    try:
+        pools = [_history_pool(user_id)] if user_id is not None else _history_pools()
+        if len(pools) == 1:
+            with pools[0].connection() as conn:
+                rows = _search_shard(conn, conditions, params, since, until, order, limit + 1, offset)
+        else:
+            # Each shard returns its first offset + limit + 1 matches, tagged
+            # with their position in that shard's order
+            ranked = []
+            for pool in pools:
+                with pool.connection() as conn:
+                    shard_rows = _search_shard(conn, conditions, params, since, until, order, offset + limit + 1, 0)
+                ranked += enumerate(shard_rows)
+            if order == 'rank':
+                ranked.sort(key=lambda item: (item[1]['timestamp'], item[1]['id']), reverse=True)
+                ranked.sort(key=lambda item: item[0])  # Stable: newest first within a position
+            else:
+                ranked.sort(key=lambda item: (item[1]['timestamp'], item[1]['id']), reverse=True)
+            rows = [row for _, row in ranked[offset:offset + limit + 1]]
+        records = rows[:limit]
+        next_offset = offset + limit if len(rows) > limit and offset + limit < max_offset else None
+        log_hot_path(logger, "Search for %r matched %d records", query, len(records))
+        return records, next_offset
+
+    except sqlite3.Error as e:
+        logger.error(f"Error searching history: {e}")
+        raise
+
+def _search_shard(conn, conditions, params, since, until, order, limit, offset):
+    """Run a search_history query on one shard; returns the matching records."""
+    # Row id bounds are applied inside the FTS5 scan, before any join
+    bounds, bound_params = [], []
+    if since or until:
+        id_range = _id_range(conn, since, until)
+        if id_range is None:
+            return []
+        for bound, value in zip(('history_search.rowid >= ?', 'history_search.rowid <= ?'), id_range):
+            if value is not None:
+                bounds.append(bound)
+                bound_params.append(value)
+    if order == 'rank':
+        floor = conn.execute(f'''
+            SELECT rowid FROM history_search
+            WHERE {' AND '.join(['history_search MATCH ?'] + bounds)}
+            ORDER BY rowid DESC
+            LIMIT 1 OFFSET ?
+        ''', params[:1] + bound_params + [SEARCH_RANK_WINDOW - 1]).fetchone()
+        if floor is not None:
+            bounds.append('history_search.rowid >= ?')
+            bound_params.append(floor[0])
+
+    # Rank and page on ids only, then read the rows of that page. bm25()
+    # has a fixed cost per query (it counts matches across the index),
+    # so it is only computed when ranking.
+    source = 'history_search'
+    if len(conditions) > 1:
+        source += ' JOIN calculation_history AS f ON f.id = history_search.rowid'
+    rank = SEARCH_RANK if order == 'rank' else 'NULL'
+    order_by = 'rank, history_search.rowid DESC' if order == 'rank' else 'history_search.rowid DESC'
+    rows = conn.execute(f'''
+        SELECT h.*, page.rank AS rank
+        FROM (
+            SELECT history_search.rowid AS id, {rank} AS rank
+            FROM {source}
+            WHERE {' AND '.join(conditions + bounds)}
+            ORDER BY {order_by}
+            LIMIT ? OFFSET ?
+        ) AS page
+        JOIN calculation_history AS h ON h.id = page.id
+        ORDER BY {'page.rank, h.id DESC' if order == 'rank' else 'h.id DESC'}
+    ''', params + bound_params + [limit, offset]).fetchall()
+    return [dict(row) for row in rows]
+
+def get_last_calculation(user_id=None):
+    """
+    Get the newest history entry, served from memory after the first call.
+
+    Args:
+        user_id (str, optional): Only consider this user's records
+
+    Returns:
+        dict: The newest record, or None if there is no history
+    """
+    return history_state.last(user_id)
+
+def get_history_etag():
+    """
+    Get a tag for the current state of history without reading it.
+
+    Returns:
+        str: Changes whenever history may have changed; the same in every
+            process serving the database, except one with queued write-behind entries
+    """
+    return history_state.etag()
 
 def delete_calculation(record_id):
     """
@@ -149,16 +1255,20 @@ def delete_calculation(record_id):
     Returns:
         bool: True if successful, False otherwise
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM calculation_history WHERE id = ?', (record_id,))
-        success = cursor.rowcount > 0
-        conn.commit()
+        pool = _record_pool(record_id)
+        success = False
+        if pool is not None:
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('DELETE FROM calculation_history WHERE id = ?', (record_id,))
+                success = cursor.rowcount > 0
+                conn.commit()
         
         if success:
+            history_state.changed(1)
+            history_hub.publish(EVENT_DELETE, {'id': record_id})
             logger.info(f"Deleted history record {record_id}")
         else:
             logger.warning(f"No history record found with ID {record_id}")
@@ -166,44 +1276,259 @@ def delete_calculation(record_id):
 
     except sqlite3.Error as e:
         logger.error(f"Error deleting history record: {e}")
-        if conn:
-            conn.rollback()
         return False
-    finally:
-        if conn:
-            conn.close()
 
 def clear_history():
     """
-    Clear all calculation history.
+    Clear all calculation history, on every shard.
 
     Returns:
         int: Number of records deleted
     """
-    conn = None
+    count = 0
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('DELETE FROM calculation_history')
-        count = cursor.rowcount
-        conn.commit()
+        if _writer is not None:
+            _writer.flush()  # Queued entries are part of the history being cleared
+        for pool in _history_pools():
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+                
+                cursor.execute('DELETE FROM calculation_history')
+                count += cursor.rowcount
+                conn.commit()
+        history_state.changed(count)
+        history_hub.publish(EVENT_CLEAR, {})
         
         logger.info(f"Cleared history, deleted {count} records")
         return count
 
     except sqlite3.Error as e:
+        if count:
+            history_state.changed(count)  # Some shards were cleared
         logger.error(f"Error clearing history: {e}")
-        if conn:
-            conn.rollback()
         return 0
+
+def get_history_stats():
+    """
+    Get history row and user counts of every shard, read from the per-user
+    counters rather than by scanning.
+
+    Returns:
+        dict: 'shards' (list of dicts with shard, file, rows, users and
+            bytes on disk) and the 'rows' and 'users' totals
+    """
+    try:
+        shards = []
+        for index, pool in enumerate(_history_pools()):
+            with pool.connection() as conn:
+                rows, users = conn.execute('''
+                    SELECT COALESCE(SUM(row_count), 0), COUNT(*) FROM history_counts WHERE row_count > 0
+                ''').fetchone()
+            size = sum(os.path.getsize(pool.db_path + suffix) for suffix in ('', '-wal')
+                       if os.path.exists(pool.db_path + suffix))
+            shards.append({
+                'shard': index,
+                'file': os.path.basename(pool.db_path),
+                'rows': rows,
+                'users': users,
+                'bytes': size,
+            })
+        # A user's history lives in one shard, so users add up too
+        return {
+            'shards': shards,
+            'rows': sum(shard['rows'] for shard in shards),
+            'users': sum(shard['users'] for shard in shards),
+        }
+
+    except sqlite3.Error as e:
+        logger.error(f"Error retrieving history stats: {e}")
+        raise
+
+def _iter_shard(pool, batch_size):
+    """Yield a shard's history oldest first, one keyset read per batch."""
+    after = ('', 0)
+    while True:
+        with pool.connection() as conn:
+            rows = conn.execute('''
+                SELECT * FROM calculation_history
+                WHERE (timestamp, id) > (?, ?)
+                ORDER BY timestamp, id
+                LIMIT ?
+            ''', after + (batch_size,)).fetchall()
+        if not rows:
+            return
+        yield from (dict(row) for row in rows)
+        after = (rows[-1]['timestamp'], rows[-1]['id'])
+
+def reshard_history(shards, source_shards=None, batch_size=RESHARD_BATCH_SIZE):
+    """
+    Copy all history from one shard layout into another, e.g. from the
+    single DB_PATH file into 8 shard files. Entries keep their owners,
+    timestamps and order but get new ids in their new shard. The source is
+    left untouched; switch HISTORY_SHARDS to the new count afterwards.
+    Nothing may write history while this runs.
+
+    Args:
+        shards (int): Shard count to copy into
+        source_shards (int, optional): Current shard count (default HISTORY_SHARDS)
+        batch_size (int): Rows copied per transaction and shard
+
+    Returns:
+        list: Number of rows copied into each target shard
+
+    Raises:
+        ValueError: If the layouts are the same or a target shard already has history
+    """
+    source_shards = source_shards or HISTORY_SHARDS
+    if shards < 1 or shards == source_shards:
+        raise ValueError(f"Cannot reshard history from {source_shards} to {shards} shards")
+
+    sources = _open_shards(source_shards)
+    targets = _open_shards(shards)
+    try:
+        for pool in targets:
+            with pool.connection() as conn:
+                if conn.execute('SELECT EXISTS (SELECT 1 FROM calculation_history)').fetchone()[0]:
+                    raise ValueError(f"Target shard {pool.db_path} already has history")
+
+        copied = [0] * shards
+        buffers = [[] for _ in range(shards)]
+
+        def flush(index):
+            with targets[index].connection() as conn:
+                conn.executemany('''
+                    INSERT INTO calculation_history (expression, result, timestamp, voice_input, user_id)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', buffers[index])
+                conn.commit()
+            copied[index] += len(buffers[index])
+            buffers[index].clear()
+
+        # Oldest first across all sources, so ids keep following timestamps
+        rows = heapq.merge(*(_iter_shard(pool, batch_size) for pool in sources),
+                           key=lambda row: (row['timestamp'], row['id']))
+        for row in rows:
+            index = shard_index(row['user_id'], shards)
+            buffers[index].append((row['expression'], row['result'], row['timestamp'],
+                                   row['voice_input'], row['user_id']))
+            if len(buffers[index]) >= batch_size:
+                flush(index)
+        for index in range(shards):
+            if buffers[index]:
+                flush(index)
+        logger.info(f"Resharded {sum(copied)} history records from {source_shards} to {shards} shards")
+        return copied
+
     finally:
-        if conn:
-            conn.close()
+        for pool in sources + targets:
+            if pool is not _pool:
+                pool.close()
+
+_MISSING = object()  # Cached marker for keys that have no row
+
+class SettingsCache:
+    """
+    Thread-safe read-through cache of the settings table.
+    Reads are served from memory; writes go to the database first and then
+    update the cache. Writes from other processes are noticed through the
+    settings version counter, checked at most every check_interval seconds.
+    At most max_size keys are kept, since per-user keys come from requests.
+    """
+
+    def __init__(self, check_interval=SETTINGS_CHECK_INTERVAL, max_size=SETTINGS_CACHE_SIZE):
+        self.check_interval = check_interval
+        self._values = LRUCache(max_size, ttl=None)
+        self._db_path = None
+        self._version = None  # settings_version the cached values belong to
+        self._checked_at = 0.0
+        self._generation = 0  # Bumped on every invalidation, so stale reads are not stored
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._reloads = 0
+
+    def _invalidate(self, version):
+        """Drop all cached values. Caller holds the lock."""
+        if self._values:
+            self._reloads += 1
+        self._values.clear()
+        self._generation += 1
+        self._version = version
+        self._db_path = DB_PATH
+
+    def _validate(self):
+        """Reload when another process changed settings or DB_PATH changed."""
+        now = time.monotonic()
+        with self._lock:
+            if self._db_path == DB_PATH and now - self._checked_at < self.check_interval:
+                return
+        with get_db_connection() as conn:
+            version = conn.execute('SELECT version FROM settings_version WHERE id = 1').fetchone()[0]
+        with self._lock:
+            if version != self._version or self._db_path != DB_PATH:
+                self._invalidate(version)
+            self._checked_at = now
+
+    def get(self, key, default=None):
+        """Return the cached value of key, reading it from the database on a miss."""
+        self._validate()
+        with self._lock:
+            value = self._values.get(key)
+            if value is not None:
+                self._hits += 1
+                return default if value is _MISSING else value
+            self._misses += 1
+            generation = self._generation
+
+        with get_db_connection() as conn:
+            row = conn.execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
+        value = row['value'] if row else _MISSING
+        with self._lock:
+            if generation == self._generation:
+                self._values.set(key, value)
+        return default if value is _MISSING else value
+
+    def set(self, key, value):
+        """Write key to the database, then update the cached value."""
+        value = str(value)
+        with get_db_connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')  # Version before and after the write, atomically
+            before = conn.execute('SELECT version FROM settings_version WHERE id = 1').fetchone()[0]
+            conn.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, value))
+            version = conn.execute('SELECT version FROM settings_version WHERE id = 1').fetchone()[0]
+            conn.commit()
+        with self._lock:
+            # Keep the cache only if nobody else wrote since it was loaded
+            if before != self._version or self._db_path != DB_PATH:
+                self._invalidate(version)
+            else:
+                self._version = version
+                self._generation += 1  # Reads started before this write must not overwrite it
+            self._values.set(key, value)
+
+    def clear(self):
+        """Forget all cached values."""
+        with self._lock:
+            self._invalidate(None)
+            self._checked_at = 0.0
+
+    def stats(self):
+        """Return cache counters."""
+        with self._lock:
+            return {
+                'entries': len(self._values),
+                'max_entries': self._values.max_size,
+                'evictions': self._values.evictions,
+                'hits': self._hits,
+                'misses': self._misses,
+                'reloads': self._reloads,
+            }
+
+settings_cache = SettingsCache()
 
 def get_setting(key, default=None):
     """
-    Get a setting value.
+    Get a setting value (served from settings_cache).
 
     Args:
         key (str): Setting key
@@ -212,25 +1537,16 @@ def get_setting(key, default=None):
     Returns:
         str: Setting value
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT value FROM settings WHERE key = ?', (key,))
-        row = cursor.fetchone()
-        return row['value'] if row else default
+        return settings_cache.get(key, default)
 
     except sqlite3.Error as e:
         logger.error(f"Error retrieving setting '{key}': {e}")
         return default
-    finally:
-        if conn:
-            conn.close()
 
 def set_setting(key, value):
     """
-    Set a setting value.
+    Set a setting value (written through settings_cache).
 
     Args:
         key (str): Setting key
@@ -239,63 +1555,88 @@ def set_setting(key, value):
     Returns:
         bool: True if successful
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)', (key, str(value)))
-        conn.commit()
-        logger.info(f"Set setting: {key} = {value}")
+        settings_cache.set(key, value)
+        log_hot_path(logger, "Set setting: %s = %s", key, value)
         return True
 
     except sqlite3.Error as e:
         logger.error(f"Error setting '{key}': {e}")
-        if conn:
-            conn.rollback()
         return False
-    finally:
-        if conn:
-            conn.close()
 
-def get_voice_calculations(limit=10):
+def _preference_key(user_id, name):
+    return f"pref:{user_id}:{name}"
+
+def get_preference(name, default=None, user_id=DEFAULT_USER_ID):
+    """
+    Get a per-user preference (e.g. the UI theme).
+
+    Args:
+        name (str): Preference name
+        default: Value returned if the user has not set it
+        user_id (str): Preference owner
+
+    Returns:
+        str: Preference value
+    """
+    return get_setting(_preference_key(user_id, name), default)
+
+def set_preference(name, value, user_id=DEFAULT_USER_ID):
+    """
+    Set a per-user preference.
+
+    Args:
+        name (str): Preference name
+        value (str): Preference value
+        user_id (str): Preference owner
+
+    Returns:
+        bool: True if successful
+    """
+    return set_setting(_preference_key(user_id, name), value)
+
+def get_voice_calculations(limit=10, user_id=None):
     """
     Get calculation history specifically from voice inputs.
 
     Args:
         limit (int): Maximum number of records to return
+        user_id (str, optional): Only return this user's records
 
     Returns:
         list: List of voice calculation records
     """
-    conn = None
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT * FROM calculation_history 
-            WHERE voice_input = 1
-            ORDER BY timestamp DESC 
-            LIMIT ?
-        ''', (limit,))
-        
-        results = [dict(row) for row in cursor.fetchall()]
-        logger.info(f"Retrieved {len(results)} voice-input records")
+        pending = _writer.pending() if _writer is not None else []
+        if user_id is not None:
+            results = _query_history('''
+                SELECT * FROM calculation_history 
+                WHERE user_id = ? AND voice_input = 1
+                ORDER BY id DESC 
+                LIMIT ?
+            ''', (user_id, limit), user_id)
+        else:
+            results = _query_history('''
+                SELECT * FROM calculation_history 
+                WHERE voice_input = 1
+                ORDER BY timestamp DESC 
+                LIMIT ?
+            ''', (limit,))
+            results.sort(key=lambda row: row['timestamp'], reverse=True)  # Merge the shards
+            results = results[:limit]
+        if pending:
+            results = _merge_pending(pending, results, limit, user_id, voice_only=True)
+        log_hot_path(logger, "Retrieved %d voice-input records", len(results))
         return results
 
     except sqlite3.Error as e:
         logger.error(f"Error retrieving voice-input history: {e}")
         raise
-    finally:
-        if conn:
-            conn.close()
 
 def init_db():
     """
     Public function to initialize the database.
-    Opens (and thus creates) the DB and then closes it.
+    Creates the connection pools and ensures the schema exists, once per process.
     """
-    conn = get_db_connection()
-    conn.close()
+    _history_pools()
     logger.info("Database initialized.")
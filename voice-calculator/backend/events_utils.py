@@ -0,0 +1,214 @@
+"""
+Event utilities for Voice Calculator application.
+Fans history changes out to Server-Sent Events streams. The hub is per
+process: each stream gets a bounded buffer, and a stream that falls too far
+behind is disconnected and resumes from its Last-Event-ID on reconnect.
+"""
+import json
+import logging
+import threading
+from collections import deque
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+SUBSCRIBER_BUFFER = 64  # Events a stream may fall behind before it is disconnected
+MAX_SUBSCRIBERS = 1000  # Open streams per process
+HEARTBEAT_INTERVAL = 15.0  # Seconds between keep-alive comments on an idle stream
+RETRY_MS = 3000  # Reconnect delay suggested to EventSource clients
+REPLAY_LIMIT = 200  # Most entries replayed after a Last-Event-ID
+
+# Event types
+EVENT_HISTORY = "history"  # A committed history entry; its row id is the event id
+EVENT_DELETE = "delete"  # One entry was deleted
+EVENT_CLEAR = "clear"  # All history was cleared
+
+HEARTBEAT = ": keep-alive\n\n"
+STREAM_HEADERS = [("Cache-Control", "no-cache"), ("X-Accel-Buffering", "no")]  # No caching or proxy buffering
+
+
+class Subscriber:
+    """Bounded buffer of events for one open stream."""
+
+    def __init__(self, user_id=None, buffer_size=SUBSCRIBER_BUFFER, notify=None):
+        """
+        Args:
+            user_id (str): Only receive this user's events (None for all)
+            buffer_size (int): Events buffered before the stream is dropped
+            notify (callable): Called after every delivery, e.g. to wake an event loop
+        """
+        self.user_id = user_id
+        self.buffer_size = buffer_size
+        self.closed = False  # Set when unsubscribed or dropped as a slow consumer
+        self.dropped = False
+        self._events = deque()
+        self._cond = threading.Condition()
+        self._notify = notify
+
+    def offer(self, event):
+        """
+        Buffer an event without blocking.
+
+        Returns:
+            bool: False if the subscriber is closed or was just dropped for being full
+        """
+        with self._cond:
+            if self.closed:
+                return False
+            if len(self._events) >= self.buffer_size:
+                self.closed = self.dropped = True
+                self._events.clear()
+            else:
+                self._events.append(event)
+            self._cond.notify_all()
+        if self._notify is not None:
+            self._notify()
+        return not self.closed
+
+    def take(self, timeout=None):
+        """Wait up to timeout seconds for events and return all buffered ones."""
+        with self._cond:
+            self._cond.wait_for(lambda: self._events or self.closed, timeout)
+            return self._drain()
+
+    def drain(self):
+        """Return all buffered events without waiting."""
+        with self._cond:
+            return self._drain()
+
+    def _drain(self):
+        """Caller holds the condition's lock."""
+        events = list(self._events)
+        self._events.clear()
+        return events
+
+    def close(self):
+        """Stop the stream; waiting readers wake up."""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+        if self._notify is not None:
+            self._notify()
+
+
+class HistoryHub:
+    """Thread-safe fan-out of history events to the subscribers of this process."""
+
+    def __init__(self, max_subscribers=MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.published = 0
+        self.slow_disconnects = 0
+
+    def subscribe(self, user_id=None, notify=None):
+        """
+        Open a subscription.
+
+        Returns:
+            Subscriber: The new subscriber, or None if the hub is full
+        """
+        subscriber = Subscriber(user_id, notify=notify)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        """Close a subscription and stop delivering to it."""
+        subscriber.close()
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def publish(self, event_type, data, event_id=None, user_id=None):
+        """
+        Deliver an event to every matching subscriber without blocking the caller.
+        Subscribers whose buffer is full are disconnected.
+
+        Args:
+            event_type (str): One of the EVENT_* types
+            data (dict): JSON-serializable payload
+            event_id (int): Row id clients resume from (None for events without one)
+            user_id (str): Owner; None reaches every subscriber
+        """
+        event = (event_id, event_type, data)
+        with self._lock:
+            self.published += 1
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            if user_id is not None and subscriber.user_id not in (None, user_id):
+                continue
+            if not subscriber.offer(event) and subscriber.dropped:
+                with self._lock:
+                    if subscriber in self._subscribers:
+                        self._subscribers.discard(subscriber)
+                        self.slow_disconnects += 1
+                logger.warning("Disconnected a slow history stream subscriber")
+
+    def stats(self):
+        """Return subscriber and event counters."""
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self.published,
+                "slow_disconnects": self.slow_disconnects,
+            }
+
+
+history_hub = HistoryHub()
+
+
+def format_event(event_id, event_type, data):
+    """Format one event in the text/event-stream wire format."""
+    lines = [] if event_id is None else [f"id: {event_id}"]
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def format_events(events, seen=()):
+    """
+    Format events, skipping entries whose ids are in seen (already sent in
+    the replayed backlog). Ids are compared for identity, not order: entries
+    committed concurrently, or in different history shards, are not
+    published in id order.
+    """
+    return "".join(
+        format_event(event_id, event_type, data) for event_id, event_type, data in events
+        if event_id is None or event_id not in seen
+    )
+
+
+def replay_events(entries):
+    """Turn history records (oldest first) into EVENT_HISTORY events."""
+    return [(entry["id"], EVENT_HISTORY, entry) for entry in entries]
+
+
+def event_stream(subscriber, backlog=(), heartbeat=HEARTBEAT_INTERVAL):
+    """
+    Blocking generator for a WSGI streaming response: the replayed backlog,
+    then live events, with keep-alive comments while idle. Ends when the
+    subscriber is dropped, and unsubscribes when the client goes away.
+
+    Args:
+        subscriber (Subscriber): Subscription opened before the backlog was read
+        backlog (list): Replayed events, oldest first
+        heartbeat (float): Seconds between keep-alive comments
+    """
+    seen = {event[0] for event in backlog}
+    try:
+        yield f"retry: {RETRY_MS}\n\n" + format_events(backlog)
+        while not subscriber.closed:
+            events = subscriber.take(heartbeat)
+            if not events:
+                if not subscriber.closed:
+                    yield HEARTBEAT
+                continue
+            text = format_events(events, seen)
+            if text:
+                yield text
+    finally:
+        history_hub.unsubscribe(subscriber)
@@ -0,0 +1,401 @@
+"""
+Evaluation guards for Voice Calculator application.
+Rejects oversized expressions up front and runs SymPy work in a pool of
+worker processes with per-task wall-clock and memory limits, so a runaway
+expression can't pin a request thread.
+"""
+import ast
+import queue
+import signal
+import logging
+import importlib
+import threading
+import multiprocessing
+from collections import Counter
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; memory limits are skipped
+    resource = None
+
+from calc_utils import fast_evaluate, UnsupportedExpression, ENGINE_FAST, ENGINE_SYMPY
+from cache_utils import expression_cache, KIND_REJECTED
+from metrics_utils import time_stage, STAGE_PARSE, STAGE_EVALUATE
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+MAX_EXPRESSION_LENGTH = 500  # Characters
+MAX_POWER_DEPTH = 2  # Nested powers, e.g. 2^3^4 has depth 2
+MAX_AST_NODES = 400  # Parsed syntax tree size
+POOL_WORKERS = 2  # Worker processes for SymPy evaluation
+TASK_TIMEOUT = 2.0  # Seconds a task may run before its worker is killed
+WORKER_START_TIMEOUT = 30.0  # Seconds a new worker may take to import its tasks
+WORKER_MEMORY_LIMIT = 1024 * 1024 * 1024  # Address-space limit per worker, in bytes
+POOL_START_METHOD = "spawn"  # Safe to use from a threaded server
+CACHED_REJECTIONS = ("timeout", "memory")  # Rejections repeated from cache instead of re-running the task
+
+# Work that may run in a worker process: name -> "module:function"
+TASKS = {
+    "sympy_evaluate": "calc_utils:sympy_evaluate",
+    "simplify": "ai_utils:simplify_expression",
+    "steps": "ai_utils:render_steps",
+    "vectorize": "calc_utils:evaluate_vectorized",
+}
+
+# Tasks each worker runs before reporting ready, so SymPy's lazily loaded
+# numeric and simplification code isn't paid for by the first request
+WORKER_WARM_UP = [
+    ("sympy_evaluate", ("sqrt(2)*pi + E",)),
+    ("simplify", ("sin(x)**2 + cos(x)**2",)),
+    ("vectorize", ("x + 1", {"x": [0]})),
+]
+
+# Rejection counters, by reason
+_rejections = Counter()
+_rejections_lock = threading.Lock()
+
+
+class ExpressionRejected(ValueError):
+    """Raised when an expression is refused or aborted by a guard."""
+
+    def __init__(self, reason, message=None):
+        super().__init__(message or f"Expression rejected: {reason}")
+        self.reason = reason
+
+
+class BudgetExceeded(Exception):
+    """Raised inside time_budget() when the block runs out of time."""
+
+
+def _reject(reason, message=None):
+    with _rejections_lock:
+        _rejections[reason] += 1
+    logger.warning(f"Expression rejected ({reason}): {message or ''}")
+    raise ExpressionRejected(reason, message)
+
+
+def _power_depth(node):
+    """Length of the longest chain of nested powers under node."""
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+        return 1 + max(_power_depth(node.left), _power_depth(node.right))
+    return max((_power_depth(child) for child in ast.iter_child_nodes(node)), default=0)
+
+
+def check_expression(expression: str):
+    """
+    Reject expressions that are too long, too deeply nested in powers or too large.
+
+    Args:
+        expression (str): Cleaned expression, using ^ or ** for powers
+
+    Raises:
+        ExpressionRejected: With reason 'length', 'power_depth' or 'ast_size'
+    """
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        _reject("length", f"{len(expression)} characters (max {MAX_EXPRESSION_LENGTH})")
+
+    try:
+        tree = ast.parse(expression.replace("^", "**").strip(), mode="eval")
+    except (SyntaxError, ValueError):
+        return  # Not Python syntax; SymPy reports its own parse error
+
+    size = sum(1 for _ in ast.walk(tree))
+    if size > MAX_AST_NODES:
+        _reject("ast_size", f"{size} nodes (max {MAX_AST_NODES})")
+
+    depth = _power_depth(tree.body)
+    if depth > MAX_POWER_DEPTH:
+        _reject("power_depth", f"power tower of depth {depth} (max {MAX_POWER_DEPTH})")
+
+
+@contextmanager
+def time_budget(seconds):
+    """
+    Raise BudgetExceeded in the block if it runs longer than seconds.
+    Only enforced in a process's main thread where SIGALRM exists, as in the
+    evaluation workers; elsewhere the block runs to completion.
+    """
+    if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def _expired(signum, frame):
+        raise BudgetExceeded(f"time budget of {seconds}s exceeded")
+
+    previous = signal.signal(signal.SIGALRM, _expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def _resolve(task):
+    module_name, function_name = TASKS[task].split(":")
+    return getattr(importlib.import_module(module_name), function_name)
+
+
+def _worker_main(conn, memory_limit):
+    """Worker process loop: run tasks received over conn until it closes."""
+    if memory_limit and resource is not None:
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+    functions = {task: _resolve(task) for task in TASKS}  # Import SymPy before the first task
+    for task, args in WORKER_WARM_UP:
+        try:
+            functions[task](*args)
+        except Exception as e:
+            logger.warning(f"Worker warm-up task {task} failed: {e}")
+    conn.send(("ready", None))
+
+    while True:
+        try:
+            task, args = conn.recv()
+        except (EOFError, OSError):
+            return
+        try:
+            conn.send(("ok", functions[task](*args)))
+        except MemoryError:
+            conn.send(("memory", None))
+        except Exception as e:
+            try:
+                conn.send(("error", e))
+            except Exception:  # Exception not picklable
+                conn.send(("error", RuntimeError(str(e))))
+
+
+class EvaluationPool:
+    """
+    Pre-started worker processes for SymPy evaluation.
+    A worker that exceeds the time limit is killed and replaced; one that
+    runs out of memory is replaced after reporting it.
+    """
+
+    def __init__(self, workers=POOL_WORKERS, timeout=TASK_TIMEOUT, memory_limit=WORKER_MEMORY_LIMIT):
+        self.workers = workers
+        self.timeout = timeout
+        self.memory_limit = memory_limit
+        self._context = multiprocessing.get_context(POOL_START_METHOD)
+        self._idle = queue.Queue()
+        self._ready = set()  # Pids of workers that finished starting up
+        self.recycled = 0
+
+    def start(self):
+        for _ in range(self.workers):
+            self._idle.put(self._spawn())
+        logger.info(f"Started {self.workers} evaluation workers")
+
+    def _spawn(self):
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker_main, args=(child_conn, self.memory_limit), name="eval-worker", daemon=True)
+        process.start()
+        child_conn.close()
+        return process, parent_conn
+
+    def _recycle(self, worker):
+        process, conn = worker
+        process.kill()
+        process.join()
+        conn.close()
+        self._ready.discard(process.pid)
+        self.recycled += 1
+        self._idle.put(self._spawn())
+
+    def _await_ready(self, worker):
+        """Wait for a new worker's startup message, so imports don't count against the task timeout."""
+        process, conn = worker
+        if process.pid in self._ready:
+            return
+        try:
+            started = conn.poll(WORKER_START_TIMEOUT) and conn.recv()
+        except (EOFError, OSError):
+            started = False
+        if not started:
+            self._recycle(worker)
+            raise RuntimeError("Evaluation worker failed to start")
+        self._ready.add(process.pid)
+
+    def wait_ready(self):
+        """Block until every idle worker has finished starting up."""
+        workers = []
+        while True:
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in workers:
+            try:
+                self._await_ready(worker)
+            except RuntimeError as e:
+                logger.error(str(e))  # Already replaced by a new worker
+                continue
+            self._idle.put(worker)
+
+    def run(self, task, *args):
+        """
+        Run a task in a worker process.
+
+        Raises:
+            ExpressionRejected: With reason 'busy', 'timeout' or 'memory'
+            Exception: Whatever the task itself raised
+        """
+        try:
+            worker = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            _reject("busy", "no evaluation worker became free")
+
+        process, conn = worker
+        try:
+            self._await_ready(worker)
+            conn.send((task, args))
+            if not conn.poll(self.timeout):
+                self._recycle(worker)
+                _reject("timeout", f"{task} ran longer than {self.timeout}s")
+            status, value = conn.recv()
+        except (EOFError, OSError) as e:
+            self._recycle(worker)
+            raise RuntimeError(f"Evaluation worker failed: {e}")
+
+        if status == "memory":
+            self._recycle(worker)
+            _reject("memory", f"{task} exceeded {self.memory_limit} bytes")
+        self._idle.put(worker)
+        if status == "error":
+            raise value
+        return value
+
+    def stop(self):
+        while True:
+            try:
+                process, conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+            process.join(timeout=1)
+            if process.is_alive():
+                process.kill()
+
+
+_pool = None
+_pool_workers = 0  # Pool size started on the first guarded task; 0 runs tasks inline
+_pool_lock = threading.Lock()
+
+
+def configure_eval_pool(workers=POOL_WORKERS):
+    """
+    Set the worker pool size without starting it; the pool starts on the
+    first guarded task or an explicit start_eval_pool().
+
+    Args:
+        workers (int): Worker processes (0 runs guarded tasks inline)
+    """
+    global _pool_workers
+    _pool_workers = workers
+
+
+def start_eval_pool(workers=None, wait=False):
+    """
+    Start the worker pool now. Does nothing inside a worker process, which
+    re-imports the main module while it bootstraps.
+
+    Args:
+        workers (int): Worker processes (defaults to the configured size)
+        wait (bool): Block until every worker has imported its tasks
+
+    Returns:
+        EvaluationPool: The running pool, or None if tasks run inline
+    """
+    global _pool
+    workers = _pool_workers if workers is None else workers
+    with _pool_lock:
+        if _pool is None and multiprocessing.current_process().name == "MainProcess" and workers > 0:
+            pool = EvaluationPool(workers)
+            pool.start()
+            _pool = pool
+        pool = _pool
+    if wait and pool is not None:
+        pool.wait_ready()
+    return pool
+
+
+def stop_eval_pool():
+    """Shut down the worker pool."""
+    global _pool
+    pool, _pool = _pool, None
+    if pool is not None:
+        pool.stop()
+
+
+def run_guarded(task, *args):
+    """
+    Run a task from TASKS in the worker pool, or inline if no pool is configured.
+
+    A task that timed out or ran out of memory is rejected again straight
+    away when repeated with the same (hashable) arguments while its
+    expression_cache entry lives, instead of tying up a worker for the full
+    limit and respawning it.
+    """
+    pool = _pool if _pool is not None else start_eval_pool()
+    if pool is None:
+        return _resolve(task)(*args)
+
+    try:
+        key = (KIND_REJECTED, (task, args))
+        reason = expression_cache.get(key)
+    except TypeError:  # Unhashable arguments, e.g. vectorize's variable lists
+        key = reason = None
+    if reason is not None:
+        _reject(reason, f"{task} was rejected ({reason}) for the same input before")
+    try:
+        return pool.run(task, *args)
+    except ExpressionRejected as e:
+        if key is not None and e.reason in CACHED_REJECTIONS:
+            expression_cache.set(key, e.reason)
+        raise
+
+
+def guarded_evaluate(expression: str) -> tuple:
+    """
+    Evaluate an expression numerically behind the guards.
+    The fast path is bounded by construction and runs inline; only the SymPy
+    fallback is sent to a worker process.
+
+    Args:
+        expression (str): Cleaned expression
+
+    Returns:
+        tuple: (result as float, engine name used)
+
+    Raises:
+        ExpressionRejected: If a guard refuses or aborts the expression
+        SympifyError, ValueError, TypeError: If SymPy cannot evaluate it
+    """
+    with time_stage(STAGE_PARSE):
+        check_expression(expression)
+    with time_stage(STAGE_EVALUATE):
+        try:
+            return fast_evaluate(expression), ENGINE_FAST
+        except UnsupportedExpression:
+            pass
+        return run_guarded("sympy_evaluate", expression), ENGINE_SYMPY
+
+
+def get_guard_stats() -> dict:
+    """
+    Get rejection counters and worker pool state.
+
+    Returns:
+        dict: Rejections by reason, pool size and recycled worker count
+    """
+    with _rejections_lock:
+        rejections = dict(_rejections)
+    return {
+        "rejections": rejections,
+        "pool_workers": _pool.workers if _pool is not None else 0,
+        "recycled_workers": _pool.recycled if _pool is not None else 0,
+    }
@@ -0,0 +1,187 @@
+"""
+Metrics utilities for Voice Calculator application.
+Collects request latency histograms, per-stage timers and values other
+modules already track, and renders them in the Prometheus text format.
+Also provides sampled logging for per-request messages.
+"""
+import time
+import random
+import logging
+import functools
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Set up logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Constants
+METRIC_PREFIX = "voice_calculator_"
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"  # Prometheus text format
+
+# Pipeline stages timed with time_stage()
+STAGE_CLEAN = "clean"
+STAGE_PARSE = "parse"
+STAGE_EVALUATE = "evaluate"
+STAGE_DB = "db"
+STAGE_TTS = "tts"
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+        pairs.append(f"{name}=\"{value}\"")
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram, one series per combination of label values."""
+
+    def __init__(self, name, help_text, label_names=(), buckets=LATENCY_BUCKETS):
+        """
+        Args:
+            name (str): Metric name, without METRIC_PREFIX
+            help_text (str): One-line description
+            label_names (tuple): Names of the labels passed to observe()
+            buckets (tuple): Upper bounds in ascending order (+Inf is implicit)
+        """
+        self.name = METRIC_PREFIX + name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}  # Label values -> [per-bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        """Record one observation for the given label values."""
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        """Return the exposition lines for every series."""
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        bucket_names = self.label_names + ("le",)
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._series.items())
+        for label_values, values in series:
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                total += count
+                labels = _format_labels(bucket_names, label_values + (_format_value(bound),))
+                lines.append(f"{self.name}_bucket{labels} {total}")
+            labels = _format_labels(self.label_names, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(values[-1])}")
+            lines.append(f"{self.name}_count{labels} {total}")
+        return lines
+
+
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to produce a response, by route.", ("route", "method", "status"))
+STAGE_SECONDS = Histogram(
+    "stage_duration_seconds", "Time spent in each processing stage.", ("stage",))
+
+# Callables returning [(name, type, help, [(labels dict, value), ...]), ...]
+_collectors = []
+
+
+def observe_request(route, method, status, seconds):
+    """Record the latency of one HTTP request."""
+    REQUEST_SECONDS.observe(seconds, route, method, str(status))
+
+
+@contextmanager
+def time_stage(stage):
+    """Time the with-block as one run of a processing stage (also when it raises)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage)
+
+
+def timed(stage):
+    """Decorator that times every call of a function as a run of a stage."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with time_stage(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def register_collector(collector):
+    """
+    Register a callable that reports values on every scrape, for counters and
+    gauges other modules already keep (cache stats, pool usage, ...).
+
+    Args:
+        collector (callable): Returns a list of (name without METRIC_PREFIX,
+            "counter" | "gauge", help text, [(labels dict, value), ...])
+    """
+    _collectors.append(collector)
+
+
+def render_metrics() -> str:
+    """
+    Render all metrics in the Prometheus text exposition format.
+
+    Returns:
+        str: Exposition text, served with CONTENT_TYPE
+    """
+    lines = REQUEST_SECONDS.render() + STAGE_SECONDS.render()
+    for collector in _collectors:
+        try:
+            families = collector()
+        except Exception as e:
+            logger.error(f"Metrics collector {getattr(collector, '__name__', collector)} failed: {e}")
+            continue
+        for name, kind, help_text, samples in families:
+            name = METRIC_PREFIX + name
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+_log_sample_rate = 0.0
+
+
+def set_log_sample_rate(rate: float):
+    """
+    Emit this fraction of per-request log messages at INFO; the rest stay at DEBUG.
+
+    Args:
+        rate (float): 0 (DEBUG only) to 1 (every message at INFO)
+    """
+    global _log_sample_rate
+    _log_sample_rate = min(max(float(rate), 0.0), 1.0)
+
+
+def log_hot_path(log, message, *args):
+    """
+    Log a per-request message at DEBUG, promoting a sampled fraction to INFO.
+    Pass arguments separately so formatting only happens for emitted records.
+    """
+    if _log_sample_rate and random.random() < _log_sample_rate:
+        log.info(message, *args)
+    else:
+        log.debug(message, *args)
@@ -0,0 +1,47 @@
+"""
+Move calculation history into a new shard layout.
+Copies the single history file (or an existing set of shards) into N shard
+files under history/shards/, then prints per-shard counts. Stop the app
+first and restart it with HISTORY_SHARDS=N afterwards. The source is left
+in place, so going back only needs the old setting (until new writes land).
+
+Usage:
+    python migrate_shards.py --shards N [--from N] [--db PATH] [--batch-size N]
+"""
+import argparse
+import sys
+
+import db_utils
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--shards", type=int, required=True, help="shard count to move history into")
+    parser.add_argument("--from", dest="source", type=int, default=1,
+                        help="current shard count (default 1, the single history file)")
+    parser.add_argument("--db", help="history database (default db_utils.DB_PATH)")
+    parser.add_argument("--batch-size", type=int, default=db_utils.RESHARD_BATCH_SIZE,
+                        help="rows copied per transaction")
+    args = parser.parse_args()
+
+    if args.db:
+        db_utils.DB_PATH = args.db
+    try:
+        db_utils.configure_history_shards(args.source)
+        before = db_utils.get_history_stats()
+        copied = db_utils.reshard_history(args.shards, args.source, args.batch_size)
+    except ValueError as e:
+        sys.exit(f"error: {e}")
+    finally:
+        db_utils.close_db()
+
+    for index, rows in enumerate(copied):
+        print(f"{db_utils.shard_path(index, args.shards) if args.shards > 1 else db_utils.DB_PATH}: {rows} rows")
+    print(f"copied {sum(copied)} of {before['rows']} rows from {args.source} to {args.shards} shards; "
+          f"start the app with HISTORY_SHARDS={args.shards}")
+    if sum(copied) != before["rows"]:
+        sys.exit("error: row counts differ; history was written during the migration")
+
+
+if __name__ == "__main__":
+    main()
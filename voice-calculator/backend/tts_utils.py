@@ -2,15 +2,19 @@
 Text-to-Speech utilities for Voice Calculator application.
 Provides functions for generating audio from text and managing audio files.
 """
-from gtts import gTTS
 import os
-import uuid
+import re
+import hashlib
 import logging
 import tempfile
-import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from pathlib import Path
 import time
 
+from metrics_utils import timed, log_hot_path, STAGE_TTS
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,16 +22,99 @@ logger = logging.getLogger(__name__)
 # Constants
 VOICE_DIR = os.path.join(os.path.dirname(__file__), "static", "voice")
 MAX_CACHE_SIZE = 100  # Maximum number of TTS files to keep
-CLEANUP_THRESHOLD = 80  # Cleanup when we reach this many files
+MAX_CACHE_BYTES = 50 * 1024 * 1024  # Maximum total size of TTS files to keep
+JANITOR_INTERVAL = 30  # Seconds between background eviction passes
+TTS_MAX_WORKERS = 4  # Concurrent syntheses shared by all batch requests
+TTS_ITEM_TIMEOUT = 15  # Seconds a batch, or a request sharing another's synthesis, waits for any single clip
+STREAM_CHUNK_SIZE = 16 * 1024  # Bytes per chunk when a backend can't stream natively
+FRAGMENT_DIR = os.path.join(os.path.dirname(__file__), "static", "voice_fragments")
+
+# Fragment inventory for composing spoken numbers
+FRAGMENT_ONES = [
+    "zero", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine",
+    "ten", "eleven", "twelve", "thirteen", "fourteen", "fifteen", "sixteen",
+    "seventeen", "eighteen", "nineteen",
+]
+FRAGMENT_TENS = ["", "", "twenty", "thirty", "forty", "fifty", "sixty", "seventy", "eighty", "ninety"]
+FRAGMENT_SCALES = [(10 ** 9, "billion"), (10 ** 6, "million"), (10 ** 3, "thousand")]
+FRAGMENT_WORDS = ["hundred", "point", "minus"]
+TEMPLATE_PREFIXES = {
+    "calculating": "Calculating",
+    "result": "The result is",
+}
 
 # Ensure voice directory exists
 os.makedirs(VOICE_DIR, exist_ok=True)
 
+# Cache statistics and in-flight syntheses, keyed by tts_cache_key()
+_cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "composed": 0}
+_inflight = {}
+_cache_lock = threading.Lock()
+
+def tts_cache_key(text: str, lang: str = "en", slow: bool = False) -> str:
+    """
+    Get the content address of a TTS clip.
+    
+    Args:
+        text (str): Text to convert to speech
+        lang (str): Language code for TTS
+        slow (bool): Whether to speak slowly
+    
+    Returns:
+        str: Hex digest identifying the (text, lang, slow) combination
+    """
+    return hashlib.sha256(f"{lang}\0{int(slow)}\0{text}".encode("utf-8")).hexdigest()[:32]
+
+def _record(stat: str):
+    with _cache_lock:
+        _cache_stats[stat] += 1
+
+def get_tts_cache_stats() -> dict:
+    """
+    Get TTS cache hit/miss counters.
+    
+    Returns:
+        dict: Hits, misses, coalesced requests, composed clips, hit ratio
+            and the size of the cache index
+    """
+    with _cache_lock:
+        stats = dict(_cache_stats)
+        stats["in_flight"] = len(_inflight)
+    stats.update(_cache_index().stats())
+    lookups = stats["hits"] + stats["misses"] + stats["coalesced"] + stats["composed"]
+    stats["hit_ratio"] = round((stats["hits"] + stats["coalesced"]) / lookups, 4) if lookups else 0.0
+    return stats
+
+def lookup_tts(text: str, lang: str = "en", slow: bool = False, record: bool = True) -> str:
+    """
+    Return the cached clip for text without synthesizing it.
+    
+    Args:
+        text (str): Text that would be converted to speech
+        lang (str): Language code for TTS
+        slow (bool): Whether to speak slowly
+        record (bool): Count a hit in the cache stats
+    
+    Returns:
+        str: MP3 filename (without path), or None if not cached
+    """
+    filename = f"{tts_cache_key(text, lang, slow)}.mp3"
+    if not _cache_index().lookup(filename):
+        return None
+    if record:
+        _record("hits")
+    return filename
+
+@timed(STAGE_TTS)
 def generate_tts(text: str, lang: str = "en", slow: bool = False) -> str:
     """
     Generate a TTS mp3 file for the given text.
     Returns the filename (not full path).
     
+    Files are named by tts_cache_key(), so a phrase that has been spoken
+    before is served from disk without calling gTTS, and concurrent requests
+    for the same phrase share a single synthesis.
+    
     Args:
         text (str): Text to convert to speech
         lang (str): Language code for TTS (default: "en")
@@ -43,38 +130,242 @@ def generate_tts(text: str, lang: str = "en", slow: bool = False) -> str:
         logger.warning("Empty text provided for TTS generation")
         return None
     
-    # Check cache size and clean up if needed
-    _check_cache_size()
+    key = tts_cache_key(text, lang, slow)
+    filename = f"{key}.mp3"
+    filepath = os.path.join(VOICE_DIR, filename)
+    
+    if _cache_index().lookup(filename):
+        _record("hits")
+        return filename
+    
+    owner, event = _claim(key)
+    if not owner:
+        _record("coalesced")
+        if not event.wait(TTS_ITEM_TIMEOUT):
+            raise RuntimeError(f"Timed out waiting for TTS of '{text[:30]}'")
+        if os.path.exists(filepath):
+            return filename
+        raise RuntimeError(f"TTS generation failed for '{text[:30]}'")
     
     try:
-        # Create a unique filename
-        filename = f"{uuid.uuid4().hex}.mp3"
-        filepath = os.path.join(VOICE_DIR, filename)
+        if _cache_index().lookup(filename):  # Finished by another owner since the first check
+            _record("hits")
+            return filename
         
-        # Create TTS in a temporary file first to avoid partial files
-        with tempfile.NamedTemporaryFile(delete=False) as temp_file:
+        _record("misses")
+        _synthesize(text, lang, slow, filepath)
+        _cache_index().add(filename)
+        log_hot_path(logger, "Generated TTS file: %s for text: '%.30s'", filename, text)
+        return filename
+    finally:
+        _release(key, event)
+
+def _claim(key: str) -> tuple:
+    """
+    Become the owner of an in-flight synthesis, or find the request that already is.
+    
+    Returns:
+        tuple: (True if the caller owns the key, Event set when it completes)
+    """
+    with _cache_lock:
+        event = _inflight.get(key)
+        if event is not None:
+            return False, event
+        event = _inflight[key] = threading.Event()
+        return True, event
+
+def _release(key: str, event: threading.Event):
+    """Finish an owned synthesis and wake any waiting requests."""
+    with _cache_lock:
+        del _inflight[key]
+    event.set()
+
+def gtts_backend(text: str, lang: str, slow: bool, path: str):
+    """Default synthesis backend: render text with Google TTS into path."""
+    from gtts import gTTS
+
+    tts = gTTS(text=text, lang=lang, slow=slow)
+    tts.save(path)
+
+def _gtts_stream(text: str, lang: str, slow: bool):
+    """Yield mp3 bytes from Google TTS as each part of the text is decoded."""
+    from gtts import gTTS
+
+    yield from gTTS(text=text, lang=lang, slow=slow).stream()
+
+gtts_backend.stream = _gtts_stream
+
+# Synthesis backend: callable(text, lang, slow, path) that writes an mp3 to
+# path, optionally with a .stream(text, lang, slow) method yielding mp3 bytes
+_backend = gtts_backend
+
+def set_tts_backend(backend) -> object:
+    """
+    Replace the synthesis backend (e.g. with a local fake for tests and benchmarks).
+    
+    Args:
+        backend (callable): Function taking (text, lang, slow, path); may have
+            a stream(text, lang, slow) attribute yielding mp3 bytes
+    
+    Returns:
+        callable: The previous backend
+    """
+    global _backend
+    previous, _backend = _backend, backend
+    return previous
+
+def _synthesize(text: str, lang: str, slow: bool, filepath: str):
+    """
+    Synthesize speech with the current backend and atomically place it at filepath.
+    
+    Raises:
+        RuntimeError: If TTS generation fails
+    """
+    temp_path = None
+    try:
+        # Create TTS in a temporary file in the same directory, so the final
+        # rename is atomic and readers never see a partial file
+        with tempfile.NamedTemporaryFile(dir=VOICE_DIR, suffix=".tmp", delete=False) as temp_file:
             temp_path = temp_file.name
         
         # Generate the TTS file
-        tts = gTTS(text=text, lang=lang, slow=slow)
-        tts.save(temp_path)
+        _backend(text, lang, slow, temp_path)
         
         # Move the completed file to the final location
-        shutil.move(temp_path, filepath)
-        
-        logger.info(f"Generated TTS file: {filename} for text: '{text[:30]}{'...' if len(text) > 30 else ''}'")
-        return filename
+        os.replace(temp_path, filepath)
     
     except Exception as e:
         logger.error(f"TTS generation failed: {str(e)}")
         # Clean up temp file if it exists
-        if 'temp_path' in locals() and os.path.exists(temp_path):
+        if temp_path and os.path.exists(temp_path):
             try:
                 os.remove(temp_path)
-            except:
+            except OSError:
                 pass
         raise RuntimeError(f"TTS generation failed: {str(e)}")
 
+def _backend_chunks(text: str, lang: str, slow: bool):
+    """Yield mp3 bytes from the backend, natively streamed when it supports it."""
+    stream = getattr(_backend, "stream", None)
+    if stream is not None:
+        yield from stream(text, lang, slow)
+        return
+    
+    with tempfile.TemporaryDirectory(dir=VOICE_DIR) as temp_dir:
+        path = os.path.join(temp_dir, "clip.mp3")
+        _backend(text, lang, slow, path)
+        with open(path, "rb") as f:
+            while True:
+                chunk = f.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+class _StreamingSynthesis:
+    """
+    Response iterable that yields audio as the backend produces it while
+    writing the same bytes into the cache. The cached file only appears
+    once the stream completes; an abandoned stream leaves nothing behind.
+    """
+
+    def __init__(self, text: str, lang: str, slow: bool, key: str, event: threading.Event):
+        self.text, self.lang, self.slow = text, lang, slow
+        self.key = key
+        self.event = event
+        self.filename = f"{key}.mp3"
+        self._temp_path = None
+        self._closed = False
+        self._chunks = self._generate()
+        self._first = b""
+
+    def prime(self):
+        """
+        Wait for the first chunk, so a backend that fails immediately can be
+        reported as an error instead of an empty stream.
+        
+        Raises:
+            RuntimeError: If the backend fails before producing audio
+        """
+        try:
+            self._first = next(self._chunks, b"")
+        except Exception as e:
+            self.close()
+            raise RuntimeError(f"TTS generation failed: {str(e)}")
+
+    def _generate(self):
+        with tempfile.NamedTemporaryFile(dir=VOICE_DIR, suffix=".tmp", delete=False) as temp_file:
+            self._temp_path = temp_file.name
+            for chunk in _backend_chunks(self.text, self.lang, self.slow):
+                temp_file.write(chunk)
+                yield chunk
+        os.replace(self._temp_path, os.path.join(VOICE_DIR, self.filename))
+        self._temp_path = None
+        _cache_index().add(self.filename)
+        log_hot_path(logger, "Streamed TTS file: %s for text: '%.30s'", self.filename, self.text)
+
+    def __iter__(self):
+        try:
+            if self._first:
+                yield self._first
+            yield from self._chunks
+        except Exception as e:
+            logger.error(f"TTS streaming failed: {str(e)}")
+            raise
+        finally:
+            self.close()
+
+    def close(self):
+        """Release the in-flight claim and discard any partial file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._chunks.close()
+        if self._temp_path and os.path.exists(self._temp_path):
+            try:
+                os.remove(self._temp_path)
+            except OSError:
+                pass
+        _release(self.key, self.event)
+
+@timed(STAGE_TTS)
+def stream_tts(text: str, lang: str = "en", slow: bool = False) -> tuple:
+    """
+    Start speaking text without waiting for the whole clip to be written.
+    
+    Args:
+        text (str): Text to convert to speech
+        lang (str): Language code for TTS
+        slow (bool): Whether to speak slowly
+    
+    Returns:
+        tuple: (filename, chunks). chunks is None when the clip is already
+            cached and should be served from get_tts_path(filename); otherwise
+            it is an iterable of mp3 bytes that must be iterated or closed.
+    
+    Raises:
+        RuntimeError: If synthesis fails before producing any audio
+    """
+    key = tts_cache_key(text, lang, slow)
+    filename = f"{key}.mp3"
+    
+    if _cache_index().lookup(filename):
+        _record("hits")
+        return filename, None
+    
+    owner, event = _claim(key)
+    if not owner:
+        _record("coalesced")
+        if not event.wait(TTS_ITEM_TIMEOUT):
+            raise RuntimeError(f"Timed out waiting for TTS of '{text[:30]}'")
+        if _cache_index().lookup(filename):
+            return filename, None
+        raise RuntimeError(f"TTS generation failed for '{text[:30]}'")
+    
+    _record("misses")
+    stream = _StreamingSynthesis(text, lang, slow, key, event)
+    stream.prime()
+    return filename, stream
+
 def get_tts_path(filename: str) -> str:
     """
     Get the full path for a TTS filename.
@@ -87,42 +378,137 @@ def get_tts_path(filename: str) -> str:
     """
     return os.path.join(VOICE_DIR, filename)
 
-def _check_cache_size():
+class AudioCacheIndex:
     """
-    Check the number of files in the TTS cache directory and clean up old files if needed.
+    In-memory LRU index of the mp3 files in VOICE_DIR with byte accounting.
+    Built from one directory scan, then kept current as files are added,
+    used and evicted. Eviction runs in a background janitor thread.
     """
-    try:
-        # Get all mp3 files in the voice directory
-        voice_files = [f for f in os.listdir(VOICE_DIR) if f.endswith('.mp3')]
+
+    def __init__(self, directory: str, max_files: int = MAX_CACHE_SIZE, max_bytes: int = MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self.evictions = 0
+        self._files = OrderedDict()  # filename -> size, least recently used first
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._janitor = None
+
+    def rebuild(self):
+        """Scan the directory once, ordering files by modification time."""
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.name.endswith(".mp3") and entry.is_file():
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        with self._lock:
+            self._files = OrderedDict((name, size) for _, name, size in entries)
+            self.total_bytes = sum(self._files.values())
+        logger.info(f"Indexed {len(entries)} cached TTS files ({self.total_bytes} bytes)")
+
+    def add(self, filename: str):
+        """Record a newly written file and wake the janitor if over a cap."""
+        size = os.path.getsize(os.path.join(self.directory, filename))
+        with self._lock:
+            self.total_bytes += size - self._files.pop(filename, 0)
+            self._files[filename] = size
+            over = len(self._files) > self.max_files or self.total_bytes > self.max_bytes
+        if over:
+            self._wakeup.set()
+
+    def lookup(self, filename: str) -> bool:
+        """
+        Check whether a file is cached and mark it as recently used.
+        Files written or removed by other processes are reconciled here.
+        """
+        exists = os.path.exists(os.path.join(self.directory, filename))
+        with self._lock:
+            if filename in self._files:
+                if exists:
+                    self._files.move_to_end(filename)
+                else:
+                    self.total_bytes -= self._files.pop(filename)
+                return exists
+        if exists:
+            self.add(filename)
+        return exists
+
+    def remove(self, filename: str):
+        """Forget a file that has been deleted."""
+        with self._lock:
+            self.total_bytes -= self._files.pop(filename, 0)
+
+    def evict(self) -> int:
+        """
+        Delete least recently used files until both caps are met.
         
-        # If we're over the threshold, clean up
-        if len(voice_files) > CLEANUP_THRESHOLD:
-            logger.info(f"TTS cache size ({len(voice_files)}) exceeds threshold ({CLEANUP_THRESHOLD}). Cleaning up...")
-            
-            # Get file paths with their modification times
-            file_times = []
-            for filename in voice_files:
-                file_path = os.path.join(VOICE_DIR, filename)
-                mod_time = os.path.getmtime(file_path)
-                file_times.append((file_path, mod_time))
-            
-            # Sort by modification time (oldest first)
-            file_times.sort(key=lambda x: x[1])
-            
-            # Delete oldest files until we're under the maximum
-            files_to_delete = len(file_times) - MAX_CACHE_SIZE
-            if files_to_delete > 0:
-                for i in range(files_to_delete):
-                    try:
-                        os.remove(file_times[i][0])
-                        logger.debug(f"Deleted old TTS file: {os.path.basename(file_times[i][0])}")
-                    except Exception as e:
-                        logger.warning(f"Failed to delete old TTS file {file_times[i][0]}: {str(e)}")
-                
-                logger.info(f"Cleaned up {files_to_delete} old TTS files")
-    
-    except Exception as e:
-        logger.error(f"Error during TTS cache cleanup: {str(e)}")
+        Returns:
+            int: Number of files deleted
+        """
+        deleted = 0
+        while True:
+            with self._lock:
+                if len(self._files) <= self.max_files and self.total_bytes <= self.max_bytes:
+                    break
+                filename, size = self._files.popitem(last=False)
+                self.total_bytes -= size
+            try:
+                os.remove(os.path.join(self.directory, filename))
+                deleted += 1
+                logger.debug(f"Deleted old TTS file: {filename}")
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"Failed to delete old TTS file {filename}: {str(e)}")
+        if deleted:
+            with self._lock:
+                self.evictions += deleted
+            logger.info(f"Cleaned up {deleted} old TTS files")
+        return deleted
+
+    def start_janitor(self, interval: float = JANITOR_INTERVAL):
+        """Run evict() in a daemon thread every interval seconds, or sooner when woken."""
+        def run():
+            while True:
+                self._wakeup.wait(interval)
+                self._wakeup.clear()
+                try:
+                    self.evict()
+                except Exception as e:
+                    logger.error(f"Error during TTS cache cleanup: {str(e)}")
+
+        self._janitor = threading.Thread(target=run, name="tts-janitor", daemon=True)
+        self._janitor.start()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "files": len(self._files),
+                "bytes": self.total_bytes,
+                "max_files": self.max_files,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+_index = None
+_index_lock = threading.Lock()
+
+def _cache_index() -> AudioCacheIndex:
+    """Return the cache index, building it and starting the janitor on first use."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                index = AudioCacheIndex(VOICE_DIR)
+                index.rebuild()
+                index.start_janitor()
+                index.evict()
+                _index = index
+    return _index
 
 def delete_tts_file(filename: str) -> bool:
     """
@@ -141,6 +527,7 @@ def delete_tts_file(filename: str) -> bool:
         filepath = get_tts_path(filename)
         if os.path.exists(filepath):
             os.remove(filepath)
+            _cache_index().remove(filename)
             logger.info(f"Deleted TTS file: {filename}")
             return True
         else:
@@ -150,6 +537,57 @@ def delete_tts_file(filename: str) -> bool:
         logger.error(f"Failed to delete TTS file {filename}: {str(e)}")
         return False
 
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Return the shared synthesis thread pool, creating it on first use."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=TTS_MAX_WORKERS, thread_name_prefix="tts")
+    return _executor
+
+def generate_tts_batch(texts: list, lang: str = "en", slow: bool = False,
+                       timeout: float = TTS_ITEM_TIMEOUT, max_workers: int = None) -> list:
+    """
+    Generate TTS files for many texts concurrently.
+    
+    Identical texts are synthesized once. Items that fail or take longer than
+    the timeout are reported individually without failing the batch.
+    
+    Args:
+        texts (list): Strings to convert to speech
+        lang (str): Language code for TTS
+        slow (bool): Whether to speak slowly
+        timeout (float): Seconds to wait for each item, measured from submission
+        max_workers (int, optional): Use a dedicated pool of this size instead
+            of the shared one
+    
+    Returns:
+        list: One dict per input text, in input order, with keys
+            'text', 'filename' and 'error' (None on success)
+    """
+    executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers else _get_executor()
+    try:
+        futures = {text: executor.submit(generate_tts, text, lang, slow) for text in dict.fromkeys(texts)}
+        deadline = time.monotonic() + timeout
+        outcomes = {}
+        for text, future in futures.items():
+            try:
+                outcomes[text] = (future.result(timeout=max(0, deadline - time.monotonic())), None)
+            except FutureTimeoutError:
+                outcomes[text] = (None, f"Timed out after {timeout}s")
+            except Exception as e:
+                logger.error(f"Failed to generate TTS for '{text}': {str(e)}")
+                outcomes[text] = (None, str(e))
+    finally:
+        if max_workers:
+            executor.shutdown(wait=False)
+    
+    return [{"text": text, "filename": outcomes[text][0], "error": outcomes[text][1]} for text in texts]
+
 def batch_generate_tts(texts: list, lang: str = "en") -> dict:
     """
     Generate multiple TTS files in batch.
@@ -159,18 +597,149 @@ def batch_generate_tts(texts: list, lang: str = "en") -> dict:
         lang (str): Language code for TTS
     
     Returns:
-        dict: Mapping of input texts to their filenames
+        dict: Mapping of input texts to their filenames (None on failure)
+    """
+    return {item["text"]: item["filename"] for item in generate_tts_batch(texts, lang)}
+
+# Loaded fragment audio, keyed by (lang, fragment text)
+_fragments = {}
+_fragment_langs = set()
+
+def _fragment_inventory() -> list:
+    """List every fragment text needed to compose templated numbers."""
+    words = FRAGMENT_ONES + [word for word in FRAGMENT_TENS if word]
+    words += [name for _, name in FRAGMENT_SCALES] + FRAGMENT_WORDS
+    return words + list(TEMPLATE_PREFIXES.values())
+
+def warm_fragments(lang: str = "en") -> int:
+    """
+    Pre-render and load the fragment inventory, enabling composition mode.
+    Fragments already on disk are loaded without calling gTTS.
+    
+    Args:
+        lang (str): Language code for TTS
+    
+    Returns:
+        int: Number of fragments that had to be synthesized
+    
+    Raises:
+        RuntimeError: If pydub is unavailable, or a fragment fails to render
+            or to decode (e.g. ffmpeg is not installed)
     """
-    results = {}
-    for text in texts:
+    try:
+        from pydub import AudioSegment
+        from pydub.exceptions import CouldntDecodeError
+    except ImportError:
+        raise RuntimeError("Fragment composition requires pydub")
+    
+    lang_dir = os.path.join(FRAGMENT_DIR, lang)
+    os.makedirs(lang_dir, exist_ok=True)
+    
+    synthesized = 0
+    for text in _fragment_inventory():
+        path = os.path.join(lang_dir, f"{text.lower().replace(' ', '_')}.mp3")
+        if not os.path.exists(path):
+            _synthesize(text, lang, False, path)
+            synthesized += 1
         try:
-            filename = generate_tts(text, lang)
-            results[text] = filename
-        except Exception as e:
-            logger.error(f"Failed to generate TTS for '{text}': {str(e)}")
-            results[text] = None
+            _fragments[(lang, text)] = AudioSegment.from_mp3(path)
+        except (OSError, CouldntDecodeError) as e:  # Missing ffmpeg/ffprobe raises FileNotFoundError
+            raise RuntimeError(f"Could not decode TTS fragment '{text}': {str(e)}")
+    
+    _fragment_langs.add(lang)
+    logger.info(f"Loaded {len(_fragment_inventory())} TTS fragments for '{lang}' ({synthesized} synthesized)")
+    return synthesized
+
+def number_to_fragments(value) -> list:
+    """
+    Spell a plain decimal number as fragment words.
+    
+    Args:
+        value (str | int | float): Number such as "-12.5" or 1024
+    
+    Returns:
+        list: Fragment words, or None if the number can't be composed
+            (scientific notation, text, or a billion billions and up)
+    """
+    match = re.fullmatch(r"(-)?(\d+)(?:\.(\d+))?", str(value).strip())
+    if not match:
+        return None
+    sign, integer, decimals = match.groups()
+    number = int(integer)
+    if number >= 1000 * FRAGMENT_SCALES[0][0]:
+        return None
+    
+    def below_thousand(n):
+        words = []
+        if n >= 100:
+            words += [FRAGMENT_ONES[n // 100], "hundred"]
+            n %= 100
+        if n >= 20:
+            words.append(FRAGMENT_TENS[n // 10])
+            n %= 10
+            if n:
+                words.append(FRAGMENT_ONES[n])
+        elif n or not words:
+            words.append(FRAGMENT_ONES[n])
+        return words
+    
+    words = ["minus"] if sign else []
+    if number == 0:
+        words.append("zero")
+    for scale, name in FRAGMENT_SCALES:
+        if number >= scale:
+            words += below_thousand(number // scale) + [name]
+            number %= scale
+    if number:
+        words += below_thousand(number)
+    if decimals:
+        words.append("point")
+        words += [FRAGMENT_ONES[int(digit)] for digit in decimals]
+    return words
+
+@timed(STAGE_TTS)
+def compose_tts(template: str, value, lang: str = "en") -> str:
+    """
+    Speak a templated number ("The result is 42") by joining pre-rendered
+    fragments locally, without calling gTTS.
+    
+    Args:
+        template (str): Key of TEMPLATE_PREFIXES
+        value (str | int | float): Number to speak
+        lang (str): Language code (must have been warmed)
+    
+    Returns:
+        str: MP3 filename (without path), or None if composition isn't possible
+    """
+    words = number_to_fragments(value)
+    if lang not in _fragment_langs or words is None:
+        return None
+    
+    prefix = TEMPLATE_PREFIXES[template]
+    filename = f"{tts_cache_key(f'{prefix} {value}', lang)}.mp3"
+    filepath = os.path.join(VOICE_DIR, filename)
+    if _cache_index().lookup(filename):
+        _record("hits")
+        return filename
+    
+    audio = _fragments[(lang, prefix)]
+    for word in words:
+        audio += _fragments[(lang, word)]
+    
+    with tempfile.NamedTemporaryFile(dir=VOICE_DIR, suffix=".tmp", delete=False) as temp_file:
+        temp_path = temp_file.name
+    try:
+        audio.export(temp_path, format="mp3")
+        os.replace(temp_path, filepath)
+        _cache_index().add(filename)
+    except Exception as e:
+        logger.error(f"TTS composition failed: {str(e)}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return None
     
-    return results
+    _record("composed")
+    return filename
 
 def speak_calculation(expression: str, result: str) -> tuple:
     """
@@ -183,13 +752,15 @@ def speak_calculation(expression: str, result: str) -> tuple:
     Returns:
         tuple: (expression_filename, result_filename)
     """
-    expression_speech = f"Calculating {expression}"
-    result_speech = f"The result is {result}"
+    expression_speech = f"{TEMPLATE_PREFIXES['calculating']} {expression}"
+    result_speech = f"{TEMPLATE_PREFIXES['result']} {result}"
     
     try:
-        expr_filename = generate_tts(expression_speech)
-        result_filename = generate_tts(result_speech)
-        return (expr_filename, result_filename)
+        # Synthesize both clips concurrently; numeric results are composed
+        # from fragments once they are warmed
+        expr_future = _get_executor().submit(generate_tts, expression_speech)
+        result_filename = compose_tts("result", result) or generate_tts(result_speech)
+        return (expr_future.result(timeout=TTS_ITEM_TIMEOUT), result_filename)
     except Exception as e:
         logger.error(f"Failed to generate speech for calculation: {str(e)}")
         return (None, None)